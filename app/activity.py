@@ -0,0 +1,126 @@
+"""
+Friend activity feed.
+
+Write path (`record_activity`): the event is appended in the caller's
+transaction; once that commits, its id is copied into each accepted
+friend's `FeedItem` inbox with chunked multi-row INSERTs in a separate
+transaction, so the fan-out never holds the writer's locks. Actors with
+more than `FANOUT_LIMIT` friends skip the copy (`fanned_out=False`);
+readers pull those events directly instead.
+
+Read path (`read_feed`): a keyset scan over the `(owner, event_id)` inbox
+index, merged with recent un-fanned events of high-degree friends.
+
+Unfriending or blocking drops both users' inbox copies of each other's
+events (`forget_friendship`).
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, event as sa_event, insert, union_all
+from sqlmodel import Session, func, select
+
+from app.database import get_engine
+from app.models import ActivityEvent, FeedItem, Friend
+
+
+logger = logging.getLogger(__name__)
+
+
+FANOUT_LIMIT = 5000
+FANOUT_CHUNK_SIZE = 500
+
+
+def _friends_of(username: str):
+    return union_all(
+        select(Friend.friend_username.label("username"))
+        .where(Friend.user == username, Friend.status == "accepted"),
+        select(Friend.user.label("username"))
+        .where(Friend.friend_username == username, Friend.status == "accepted"),
+    )
+
+
+def _fan_out(event_id: int, actor: str) -> None:
+    friends = _friends_of(actor).subquery()
+    with Session(get_engine()) as db:
+        followers = db.exec(select(friends.c.username)).all()
+        for i in range(0, len(followers), FANOUT_CHUNK_SIZE):
+            db.exec(
+                insert(FeedItem),
+                params=[{"owner": f, "event_id": event_id} for f in followers[i:i + FANOUT_CHUNK_SIZE]],
+            )
+        db.commit()
+
+
+def _fan_out_committed(session: Session) -> None:
+    for event_id, actor in session.info.pop("feed_fanout", []):
+        try:
+            _fan_out(event_id, actor)
+        except Exception:
+            # The event itself is committed; only the inbox copies are missing.
+            logger.exception("Feed fan-out failed for event %s.", event_id)
+
+
+def _discard_fanout(session: Session) -> None:
+    session.info.pop("feed_fanout", None)
+
+
+def record_activity(session: Session, actor: str, kind: str, payload: Dict[str, Any]) -> ActivityEvent:
+    """
+    Append an event, committed together with the caller's work. The fan-out
+    to friends' inboxes runs after that commit succeeds.
+    """
+    friends = _friends_of(actor).subquery()
+    degree = session.exec(select(func.count()).select_from(friends)).one()
+
+    event = ActivityEvent(
+        actor=actor,
+        kind=kind,
+        payload=json.dumps(payload, default=str),
+        fanned_out=degree <= FANOUT_LIMIT,
+    )
+    session.add(event)
+    session.flush()  # assigns event.id
+
+    if event.fanned_out and degree:
+        if not session.info.get("feed_listening"):
+            session.info["feed_listening"] = True
+            sa_event.listen(session, "after_commit", _fan_out_committed)
+            sa_event.listen(session, "after_rollback", _discard_fanout)
+        session.info.setdefault("feed_fanout", []).append((event.id, actor))
+    return event
+
+
+def forget_friendship(session: Session, a: str, b: str) -> None:
+    """Drop `a`'s and `b`'s inbox copies of each other's events (caller commits)."""
+    for owner, actor in ((a, b), (b, a)):
+        session.exec(
+            delete(FeedItem)
+            .where(FeedItem.owner == owner)
+            .where(FeedItem.event_id.in_(select(ActivityEvent.id).where(ActivityEvent.actor == actor)))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def read_feed(session: Session, user: str, cursor: Optional[int], limit: int) -> List[ActivityEvent]:
+    """Newest-first events before `cursor` (an event id) for `user`'s feed."""
+    inbox = (
+        select(ActivityEvent)
+        .join(FeedItem, FeedItem.event_id == ActivityEvent.id)
+        .where(FeedItem.owner == user)
+    )
+    pulled = (
+        select(ActivityEvent)
+        .where(ActivityEvent.fanned_out == False)  # noqa: E712
+        .where(ActivityEvent.actor.in_(_friends_of(user)))
+    )
+    if cursor is not None:
+        inbox = inbox.where(FeedItem.event_id < cursor)
+        pulled = pulled.where(ActivityEvent.id < cursor)
+
+    inbox = inbox.order_by(FeedItem.event_id.desc()).limit(limit)
+    pulled = pulled.order_by(ActivityEvent.id.desc()).limit(limit)
+    events = list(session.exec(inbox).all()) + list(session.exec(pulled).all())
+    events.sort(key=lambda e: e.id, reverse=True)
+    return events[:limit]
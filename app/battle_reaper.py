@@ -0,0 +1,121 @@
+"""
+Background sweeper that finalizes boss battles nobody came back to.
+
+Every started battle pushes `(deadline, user)` onto a min-heap.
+The sweeper sleeps until the earliest deadline, pops everything that is due and
+hands it to the router's finalizer in one batch (one DB transaction).
+With a shared session store, deadlines read from the store are periodically
+merged into the heap so battles started on other workers are reaped too.
+"""
+import asyncio
+import heapq
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from app.battle_store import BattleStore
+
+
+logger = logging.getLogger(__name__)
+
+REAP_BATCH_SIZE = int(os.getenv("BOSS_REAP_BATCH_SIZE", "100"))
+MAX_SLEEP_SECONDS = 1.0
+RESYNC_SECONDS = float(os.getenv("BOSS_REAP_RESYNC_SECONDS", "60"))
+
+
+class BattleReaper:
+    def __init__(self, store: BattleStore, finalize: Callable[[List[Tuple[str, datetime]]], int]):
+        self._store = store
+        self._finalize = finalize
+        self._heap: List[Tuple[datetime, str]] = []
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._last_resync: Optional[datetime] = None
+        self.reaped_total = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def schedule(self, user: str, started_at: datetime, time_limit_seconds: int) -> None:
+        deadline = started_at + timedelta(seconds=time_limit_seconds)
+        with self._lock:
+            heapq.heappush(self._heap, (deadline, user))
+
+    def _resync(self, now: datetime) -> None:
+        entries = self._store.deadlines()
+        # Merge rather than replace, so deadlines scheduled while the store
+        # was being read are kept.
+        with self._lock:
+            known = set(self._heap)
+            for user, expires_at in entries:
+                if (expires_at, user) not in known:
+                    heapq.heappush(self._heap, (expires_at, user))
+        self._last_resync = now
+
+    def _pop_due(self, now: datetime) -> List[Tuple[datetime, str]]:
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < REAP_BATCH_SIZE:
+                due.append(heapq.heappop(self._heap))
+        return due
+
+    def reap_due(self) -> int:
+        """Finalize up to one batch of due battles. Returns how many were ended."""
+        now = datetime.utcnow()
+        if self._last_resync is None or (now - self._last_resync).total_seconds() >= RESYNC_SECONDS:
+            self._resync(now)
+
+        due = self._pop_due(now)
+        if not due:
+            return 0
+
+        reaped = self._finalize([(user, deadline) for deadline, user in due])
+        lag = (datetime.utcnow() - due[0][0]).total_seconds()
+        self.last_lag_seconds = lag
+        self.max_lag_seconds = max(self.max_lag_seconds, lag)
+        self.reaped_total += reaped
+        return reaped
+
+    def _seconds_until_next(self) -> float:
+        with self._lock:
+            if not self._heap:
+                return MAX_SLEEP_SECONDS
+            wait = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+        return min(max(wait, 0.0), MAX_SLEEP_SECONDS)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                reaped = await asyncio.to_thread(self.reap_due)
+            except Exception:
+                logger.exception("Boss battle reaper failed; retrying.")
+                reaped = 0
+            # A full batch means more may be due right now.
+            if reaped < REAP_BATCH_SIZE:
+                await asyncio.sleep(self._seconds_until_next())
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            scheduled = len(self._heap)
+        return {
+            "active_sessions": self._store.count(),
+            "scheduled_deadlines": scheduled,
+            "reaped_total": self.reaped_total,
+            "last_reap_lag_seconds": round(self.last_lag_seconds, 3),
+            "max_reap_lag_seconds": round(self.max_lag_seconds, 3),
+        }
@@ -0,0 +1,252 @@
+"""
+Storage backends for live boss battle sessions.
+
+- `InMemoryBattleStore`: process-local dict, fine for a single worker / local dev.
+- `DatabaseBattleStore`: `BossBattleSession` table with an optimistic `version`
+  column, so `/boss/answer` can land on a different worker than `/boss/start`.
+
+The backend is picked with `BOSS_SESSION_STORE=memory|database` (default: memory).
+
+Within a process, every read-modify-write of a user's battle runs under
+`battle_lock(user)`, one of a fixed set of striped re-entrant locks, so a
+double-submitted answer is serialized while unrelated users rarely contend.
+"""
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, func, select
+
+from app.database import get_engine
+from app.models import BossBattleSession
+
+
+LOCK_STRIPES = 256
+_locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+
+
+def battle_lock(user: str) -> threading.RLock:
+    """The stripe lock guarding `user`'s battle in this process."""
+    return _locks[hash(user) % LOCK_STRIPES]
+
+
+class BattleState:
+    """Live battle state. Slotted: one small object per active player."""
+
+    __slots__ = (
+        "difficulty",
+        "started_at",
+        "time_limit_seconds",
+        "lives",
+        "score",
+        "index",
+        "total_questions",
+        "question_ids",
+        "version",
+    )
+
+    def __init__(
+        self,
+        difficulty: str,
+        started_at: datetime,
+        time_limit_seconds: int,
+        total_questions: int,
+        question_ids: List[int],
+        lives: int = 3,
+        score: int = 0,
+        index: int = 0,
+        version: int = 0,
+    ):
+        self.difficulty = difficulty
+        self.started_at = started_at
+        self.time_limit_seconds = time_limit_seconds
+        self.total_questions = total_questions
+        self.question_ids = question_ids
+        self.lives = lives
+        self.score = score
+        self.index = index
+        self.version = version
+
+    @property
+    def expires_at(self) -> datetime:
+        return self.started_at + timedelta(seconds=self.time_limit_seconds)
+
+    def copy(self) -> "BattleState":
+        # question_ids is never mutated after creation, so it can be shared.
+        return BattleState(**self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class BattleStore(ABC):
+    """
+    Interface shared by all session backends.
+
+    `get` returns a private copy carrying the `version` that `save` and `pop`
+    compare against, so two workers never both apply a write.
+    """
+
+    @abstractmethod
+    def get(self, user: str) -> Optional[BattleState]:
+        """The user's session, or None."""
+
+    @abstractmethod
+    def create(self, user: str, state: BattleState) -> bool:
+        """Insert a new session. Returns False if the user already has one."""
+
+    @abstractmethod
+    def save(self, user: str, state: BattleState) -> bool:
+        """Compare-and-set on `state.version`. Returns False on a lost race."""
+
+    @abstractmethod
+    def pop(self, user: str, version: Optional[int] = None) -> Optional[BattleState]:
+        """Remove and return the session if it still matches `version`."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of live sessions."""
+
+    @abstractmethod
+    def deadlines(self) -> List[Tuple[str, datetime]]:
+        """`(user, expires_at)` for every live session."""
+
+
+class InMemoryBattleStore(BattleStore):
+    def __init__(self):
+        self._sessions: Dict[str, BattleState] = {}
+
+    # Single dict operations are atomic under the GIL; the compare-and-set
+    # steps run under the user's stripe lock.
+    def get(self, user):
+        sess = self._sessions.get(user)
+        return sess.copy() if sess else None
+
+    def create(self, user, state):
+        with battle_lock(user):
+            if user in self._sessions:
+                return False
+            state.version = 1
+            self._sessions[user] = state.copy()
+            return True
+
+    def save(self, user, state):
+        with battle_lock(user):
+            current = self._sessions.get(user)
+            if not current or current.version != state.version:
+                return False
+            state.version += 1
+            self._sessions[user] = state.copy()
+            return True
+
+    def pop(self, user, version=None):
+        with battle_lock(user):
+            current = self._sessions.get(user)
+            if not current or (version is not None and current.version != version):
+                return None
+            return self._sessions.pop(user)
+
+    def count(self):
+        return len(self._sessions)
+
+    def deadlines(self):
+        return [(u, s.expires_at) for u, s in list(self._sessions.items())]
+
+
+class DatabaseBattleStore(BattleStore):
+    """Sessions persisted in `BossBattleSession`, one row per user."""
+
+    @staticmethod
+    def _encode(state: BattleState) -> str:
+        data = state.to_dict()
+        del data["version"]
+        data["started_at"] = state.started_at.isoformat()
+        return json.dumps(data)
+
+    @staticmethod
+    def _decode(row: BossBattleSession) -> BattleState:
+        data = json.loads(row.state)
+        data["started_at"] = datetime.fromisoformat(data["started_at"])
+        return BattleState(**data, version=row.version)
+
+    def get(self, user):
+        with Session(get_engine()) as db:
+            row = db.exec(select(BossBattleSession).where(BossBattleSession.user == user)).first()
+            return self._decode(row) if row else None
+
+    def create(self, user, state):
+        row = BossBattleSession(
+            user=user,
+            state=self._encode(state),
+            version=1,
+            expires_at=state.expires_at,
+        )
+        with Session(get_engine()) as db:
+            db.add(row)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return False
+        state.version = 1
+        return True
+
+    def save(self, user, state):
+        with Session(get_engine()) as db:
+            result = db.exec(
+                update(BossBattleSession)
+                .where(BossBattleSession.user == user)
+                .where(BossBattleSession.version == state.version)
+                .values(
+                    state=self._encode(state),
+                    version=state.version + 1,
+                    expires_at=state.expires_at,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+            db.commit()
+        if result.rowcount != 1:
+            return False
+        state.version += 1
+        return True
+
+    def pop(self, user, version=None):
+        with Session(get_engine()) as db:
+            row = db.exec(select(BossBattleSession).where(BossBattleSession.user == user)).first()
+            if not row or (version is not None and row.version != version):
+                return None
+            state = self._decode(row)
+            # Delete guarded by version: only one worker can claim the session.
+            result = db.exec(
+                delete(BossBattleSession)
+                .where(BossBattleSession.user == user)
+                .where(BossBattleSession.version == state.version)
+            )
+            db.commit()
+            return state if result.rowcount == 1 else None
+
+    def count(self):
+        with Session(get_engine()) as db:
+            return db.exec(select(func.count()).select_from(BossBattleSession)).one()
+
+    def deadlines(self):
+        # Column-only read: the JSON state is never decoded here.
+        with Session(get_engine()) as db:
+            return db.exec(select(BossBattleSession.user, BossBattleSession.expires_at)).all()
+
+
+def _build_store() -> BattleStore:
+    backend = os.getenv("BOSS_SESSION_STORE", "memory").lower()
+    if backend == "database":
+        return DatabaseBattleStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown BOSS_SESSION_STORE '{backend}' (expected memory|database).")
+    return InMemoryBattleStore()
+
+
+battle_store = _build_store()
@@ -0,0 +1,120 @@
+"""
+Daily boss battle leaderboard.
+
+Each `(day, difficulty)` board keeps every player's best score in a dict plus a
+sorted list of `(-score, user)`, so top-N is a slice and a player's rank is one
+dict lookup and one bisect. Boards are loaded from `BossBattle` with a grouped
+range scan over the `(difficulty, date, user, score)` index, updated in place
+as battles finalize, and reloaded after a short TTL to pick up other workers.
+Difficulty is stored and looked up lower-case.
+"""
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session, func, select
+
+from app.database import get_engine
+from app.models import BossBattle
+
+
+MAX_CACHED_BOARDS = 64
+BOARD_TTL_SECONDS = 60
+
+
+def _normalize(difficulty: Optional[str]) -> Optional[str]:
+    return difficulty.lower() if difficulty else None
+
+
+class DailyBoard:
+    def __init__(self, best: Dict[str, int]):
+        self.best = dict(best)
+        self.order: List[Tuple[int, str]] = sorted((-score, user) for user, score in best.items())
+        self.loaded_at = time.monotonic()
+
+    def record(self, user: str, score: int) -> None:
+        previous = self.best.get(user)
+        if previous is not None:
+            if score <= previous:
+                return
+            del self.order[bisect.bisect_left(self.order, (-previous, user))]
+        self.best[user] = score
+        bisect.insort(self.order, (-score, user))
+
+    def top(self, limit: int, offset: int = 0) -> List[Dict]:
+        entries = []
+        for neg_score, user in self.order[offset:offset + limit]:
+            entries.append({"rank": self._rank_of(-neg_score), "user": user, "score": -neg_score})
+        return entries
+
+    def _rank_of(self, score: int) -> int:
+        # Competition ranking: players tied on score share the same rank.
+        return bisect.bisect_left(self.order, (-score, "")) + 1
+
+    def rank(self, user: str) -> Optional[Dict]:
+        score = self.best.get(user)
+        if score is None:
+            return None
+        return {"rank": self._rank_of(score), "user": user, "score": score}
+
+
+class BossLeaderboardCache:
+    def __init__(self):
+        self._boards: "OrderedDict[Tuple[date, Optional[str]], DailyBoard]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load(day: date, difficulty: Optional[str]) -> DailyBoard:
+        start = datetime.combine(day, dt_time.min)
+        query = (
+            select(BossBattle.user, func.max(BossBattle.score))
+            .where(BossBattle.date >= start)
+            .where(BossBattle.date < start + timedelta(days=1))
+        )
+        if difficulty:
+            query = query.where(BossBattle.difficulty == difficulty)
+        with Session(get_engine()) as db:
+            rows = db.exec(query.group_by(BossBattle.user)).all()
+        return DailyBoard({user: score for user, score in rows})
+
+    def _board(self, day: date, difficulty: Optional[str]) -> DailyBoard:
+        key = (day, difficulty)
+        with self._lock:
+            board = self._boards.get(key)
+            if board and time.monotonic() - board.loaded_at < BOARD_TTL_SECONDS:
+                self._boards.move_to_end(key)
+                return board
+
+        board = self._load(day, difficulty)
+        with self._lock:
+            self._boards[key] = board
+            self._boards.move_to_end(key)
+            while len(self._boards) > MAX_CACHED_BOARDS:
+                self._boards.popitem(last=False)
+        return board
+
+    def top(self, day: date, difficulty: Optional[str], limit: int, offset: int = 0) -> List[Dict]:
+        board = self._board(day, _normalize(difficulty))
+        with self._lock:
+            return board.top(limit, offset)
+
+    def rank(self, user: str, day: date, difficulty: Optional[str]) -> Tuple[Optional[Dict], int]:
+        """The user's entry (or None) and the number of players on the board."""
+        board = self._board(day, _normalize(difficulty))
+        with self._lock:
+            return board.rank(user), len(board.best)
+
+    def record(self, user: str, when: datetime, difficulty: str, score: int) -> None:
+        """Fold a finished battle into the cached boards it belongs to."""
+        day = when.date()
+        with self._lock:
+            for key in ((day, _normalize(difficulty)), (day, None)):
+                board = self._boards.get(key)
+                if board:
+                    board.record(user, score)
+
+
+boss_leaderboard = BossLeaderboardCache()
@@ -0,0 +1,226 @@
+"""
+Read-through cache for read handlers, invalidated by table versions.
+
+    @router.get("/{username}", response_model=UserRead)
+    @cached("user", scope="username")
+    def get_user(username: str): ...
+
+A cached handler's result (JSON-encoded) is stored under its name, its
+arguments and the current version of every table it reads. Any committed
+INSERT/UPDATE/DELETE on a table bumps that table's version (Session
+`after_flush` / `do_orm_execute` record the tables written, `after_commit`
+bumps them), which makes every older entry unreachable; stale entries
+simply age out of the LRU. Versions are read before the handler
+runs, so a result computed from pre-commit data is never stored under the
+post-commit version. For the same reason misses read from the primary, not
+from a read replica.
+
+Tables in SCOPE_COLUMNS are also versioned per user. A handler declared
+with `scope=<argument>` is keyed on the `table:<user>` versions of that
+argument's user (plus the table-wide version), and a write whose owner is
+known (an ORM row of that table, or a bulk statement run with the
+`cache_scope=<user>` execution option) bumps only `table:<user>`. So a
+`grant_xp` for one user no longer invalidates every user's cached reads;
+writes with an unknown owner still bump the whole table.
+
+Backends:
+- in-memory LRU (default, `CACHE_MAX_ENTRIES`, per process)
+- Redis when `CACHE_URL=redis://...` is set (needs `pip install redis`);
+  versions live in Redis too, so every worker sees every invalidation.
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+
+from app.database import replica_reads
+
+
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+REDIS_TTL_SECONDS = 3600
+_MISSING = object()
+
+# Table -> columns naming the user(s) a row belongs to, for per-user versions.
+SCOPE_COLUMNS = {
+    "user": ("username",),
+    "avatar": ("user",),
+    "friend": ("user", "friend_username"),
+}
+
+
+class InMemoryCacheBackend:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tables: Iterable[str]) -> List[int]:
+        with self._lock:
+            return [self._versions.get(table, 0) for table in tables]
+
+    def bump(self, tables: Iterable[str]) -> None:
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Shared backend for multi-worker deployments. Entries expire after an hour."""
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed when CACHE_URL is set
+
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Any:
+        raw = self._redis.get(f"cache:{key}")
+        return _MISSING if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any) -> None:
+        self._redis.set(f"cache:{key}", json.dumps(value), ex=REDIS_TTL_SECONDS)
+
+    def versions(self, tables: Iterable[str]) -> List[int]:
+        return [int(v or 0) for v in self._redis.mget([f"cache-version:{t}" for t in tables])]
+
+    def bump(self, tables: Iterable[str]) -> None:
+        pipe = self._redis.pipeline()
+        for table in tables:
+            pipe.incr(f"cache-version:{table}")
+        pipe.execute()
+
+    def __len__(self) -> int:
+        return self._redis.dbsize()
+
+
+class QueryCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, counter: Dict[str, int], name: str) -> None:
+        with self._stats_lock:
+            counter[name] = counter.get(name, 0) + 1
+
+    def cached(self, *tables: str, scope: Optional[str] = None) -> Callable:
+        """
+        Memoize a (sync) read handler that reads `tables`. With `scope`, the
+        named argument is the user whose rows it reads: tables in
+        SCOPE_COLUMNS are then versioned for that user only.
+        """
+        tables = tuple(sorted(tables))
+        scoped = tuple(t for t in tables if scope and t in SCOPE_COLUMNS)
+
+        def decorator(func: Callable) -> Callable:
+            name = f"{func.__module__}.{func.__qualname__}"
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                version_keys = list(tables)
+                if scoped:
+                    owner = signature.bind_partial(*args, **kwargs).arguments.get(scope)
+                    version_keys += [f"{table}:{owner}" for table in scoped]
+                versions = self.backend.versions(version_keys)
+                key = f"{name}:{versions}:{args!r}:{sorted(kwargs.items())!r}"
+                value = self.backend.get(key)
+                if value is not _MISSING:
+                    self._count(self.hits, name)
+                    return value
+                self._count(self.misses, name)
+                with replica_reads(False):  # a lagging replica's rows must not be stored under the new version
+                    value = jsonable_encoder(func(*args, **kwargs))
+                self.backend.set(key, value)
+                return value
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, tables: Iterable[str]) -> None:
+        self.backend.bump(tables)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            hits, misses = dict(self.hits), dict(self.misses)
+        return {"entries": len(self.backend), "hits": hits, "misses": misses}
+
+
+def _build_cache() -> QueryCache:
+    url = os.getenv("CACHE_URL")
+    if url:
+        return QueryCache(RedisCacheBackend(url))
+    return QueryCache(InMemoryCacheBackend())
+
+
+query_cache = _build_cache()
+cached = query_cache.cached
+
+
+# ------------------------------------------------------------------
+# 🔹 Invalidation hooks (every Session, ORM flushes and bulk statements)
+# ------------------------------------------------------------------
+
+def _written(session) -> set:
+    return session.info.setdefault("written_tables", set())
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _track_flushed_tables(session, flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(type(obj), "__tablename__", None)
+        if not table:
+            continue
+        if table in SCOPE_COLUMNS:
+            _written(session).update(f"{table}:{getattr(obj, column)}" for column in SCOPE_COLUMNS[table])
+        else:
+            _written(session).add(table)
+
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _track_bulk_statements(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = orm_execute_state.statement.table.name
+        owner = orm_execute_state.execution_options.get("cache_scope")
+        if owner is not None and table in SCOPE_COLUMNS:
+            _written(orm_execute_state.session).add(f"{table}:{owner}")
+        else:
+            _written(orm_execute_state.session).add(table)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _bump_written_tables(session) -> None:
+    written = session.info.pop("written_tables", None)
+    if written:
+        query_cache.invalidate(written)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _forget_written_tables(session) -> None:
+    session.info.pop("written_tables", None)
@@ -1,28 +1,197 @@
+import itertools
 import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
 from sqlmodel import SQLModel, create_engine
 
+from app import slow_queries
+
+
+# auto: create tables / run migrations only when the stored schema version
+# differs from the models; always: on every startup; off: never (run
+# `python -m app.database` from the deploy step instead).
+SCHEMA_SYNC = os.getenv("SCHEMA_SYNC", "auto").lower()
+
+
+# Read replicas for GET handlers, comma-separated; e.g. two SQLite files
+# locally: DATABASE_REPLICA_URLS=sqlite:///replica1.db,sqlite:///replica2.db
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_RETRY_SECONDS = int(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+
+def _normalize_url(database_url: str) -> str:
+    if database_url.startswith("postgresqlpsycopg://"):
+        database_url = database_url.replace("postgresqlpsycopg://", "postgresql+psycopg://", 1)
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql+psycopg://", 1)
+    if database_url.startswith("postgresql://"):
+        database_url = database_url.replace("postgresql://", "postgresql+psycopg://", 1)
+    return database_url
+
 
 def _build_engine():
     database_url = os.getenv("DATABASE_URL")
 
     if database_url:
-        if database_url.startswith("postgresqlpsycopg://"):
-            database_url = database_url.replace("postgresqlpsycopg://", "postgresql+psycopg://", 1)
-        if database_url.startswith("postgres://"):
-            database_url = database_url.replace("postgres://", "postgresql+psycopg://", 1)
-        if database_url.startswith("postgresql://"):
-            database_url = database_url.replace("postgresql://", "postgresql+psycopg://", 1)
-        return create_engine(database_url, echo=False)
+        return create_engine(_normalize_url(database_url), echo=False)
 
     sqlite_file_name = "studyquest.db"
     sqlite_url = f"sqlite:///{sqlite_file_name}"
     return create_engine(sqlite_url, echo=False)
 
 
-engine = _build_engine()
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process-wide engine, created (and its DB driver imported) on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = _build_engine()
+                slow_queries.install(engine)
+                _engine = engine
+    return _engine
+
+
+_WRITE_STATEMENT = re.compile(r"\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b", re.IGNORECASE)
+
+
+class ReplicaSet:
+    """
+    Round-robin over the read replicas. A replica is health-checked with a
+    connection probe when it enters the rotation (first use, or after being
+    down); one whose connection fails, or that raises an OperationalError
+    mid-request, is skipped for REPLICA_RETRY_SECONDS. Stale pooled
+    connections are caught by `pool_pre_ping`.
+    """
+
+    def __init__(self, urls):
+        self.engines = []
+        self._down_until = {}
+        self._verified = set()
+        self._turn = itertools.count()
+        for url in urls:
+            engine = create_engine(_normalize_url(url), echo=False, pool_pre_ping=True)
+            event.listen(engine, "handle_error", self._on_error)
+            event.listen(engine, "before_cursor_execute", _refuse_writes)
+            slow_queries.install(engine)
+            self.engines.append(engine)
+
+    def _on_error(self, exception_context) -> None:
+        if (
+            exception_context.is_disconnect
+            or exception_context.connection is None
+            or isinstance(exception_context.sqlalchemy_exception, OperationalError)
+        ):
+            self._down_until[exception_context.engine] = time.monotonic() + REPLICA_RETRY_SECONDS
+            self._verified.discard(exception_context.engine)
+
+    def _healthy(self, engine) -> bool:
+        if self._down_until.get(engine, 0) > time.monotonic():
+            return False
+        if engine not in self._verified:
+            try:
+                with engine.connect():
+                    pass
+            except Exception:
+                self._down_until[engine] = time.monotonic() + REPLICA_RETRY_SECONDS
+                return False
+            self._verified.add(engine)
+        return True
+
+    def pick(self):
+        """Next healthy replica, or None if every replica is down."""
+        start = next(self._turn)
+        for i in range(len(self.engines)):
+            engine = self.engines[(start + i) % len(self.engines)]
+            if self._healthy(engine):
+                return engine
+        return None
+
+    def stats(self):
+        now = time.monotonic()
+        return [(i, self._down_until.get(engine, 0) <= now) for i, engine in enumerate(self.engines)]
+
+
+def _refuse_writes(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _WRITE_STATEMENT.match(statement):
+        raise RuntimeError("Write attempted on a read replica; use get_engine() for writes.")
+
+
+_replicas = None
+_replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+
+
+def get_replicas():
+    """The ReplicaSet, or None when DATABASE_REPLICA_URLS is not set."""
+    global _replicas
+    if _replicas is None and REPLICA_URLS:
+        with _engine_lock:
+            if _replicas is None:
+                _replicas = ReplicaSet(REPLICA_URLS)
+    return _replicas
+
+
+def get_read_engine():
+    """
+    Engine for a read-only handler: a replica while the current request
+    allows it (see app.read_routing), otherwise the primary. A replica
+    failing mid-request raises OperationalError, on which ReadRoutingMiddleware
+    runs the request again on the primary.
+    """
+    if _replica_reads.get():
+        replicas = get_replicas()
+        engine = replicas.pick() if replicas else None
+        if engine is not None:
+            return engine
+    return get_engine()
+
+
+@contextmanager
+def replica_reads(allowed: bool):
+    """Allow (or forbid) `get_read_engine()` to use a replica inside the block."""
+    token = _replica_reads.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def __getattr__(name):
+    # `from app.database import engine` keeps working for scripts and benches.
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def init_db(force: bool = False):
+    """Create all database tables and bring existing ones up to date."""
+    from app.migrations import applied_version, migration_lock, record_version, run_migrations, schema_fingerprint
+
+    if SCHEMA_SYNC == "off" and not force:
+        return
+    engine = get_engine()
+    version = schema_fingerprint()
+    if SCHEMA_SYNC != "always" and not force and applied_version(engine) == version:
+        return
+    with migration_lock(engine):
+        # Re-check: a worker that held the lock first may have migrated already.
+        if SCHEMA_SYNC != "always" and not force and applied_version(engine) == version:
+            return
+        SQLModel.metadata.create_all(engine)
+        run_migrations(engine)
+        record_version(engine, version)
 
 
-def init_db():
-    """Create all database tables."""
-    SQLModel.metadata.create_all(engine)
+if __name__ == "__main__":
+    init_db(force=True)
+    print("Schema is up to date.")
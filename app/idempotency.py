@@ -0,0 +1,244 @@
+"""
+`Idempotency-Key` support for write endpoints.
+
+A POST/PUT/PATCH/DELETE carrying an `Idempotency-Key` header runs once; the
+response is stored (keyed by method, path and key) and replayed for retries
+without touching the feature tables. A duplicate that arrives while the
+first is still running waits for it and gets the same response. Reusing a
+key with a different body is rejected with 422.
+
+Responses are kept for IDEMPOTENCY_TTL_SECONDS (default 24h). 5xx and 409
+responses are not stored, so the client's retry runs again.
+
+Storage is picked with `IDEMPOTENCY_STORE=memory|database` (default: memory):
+- `InMemoryIdempotencyStore`: per-process LRU, fine for a single worker.
+- `DatabaseIdempotencyStore`: `IdempotencyRecord` rows, shared by workers.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from starlette.responses import JSONResponse
+
+from app.database import get_engine
+from app.models import IdempotencyRecord
+
+
+TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+MAX_MEMORY_ENTRIES = 10_000
+LOCK_SECONDS = 30  # a claim older than this is assumed abandoned by a crashed worker
+POLL_SECONDS = 0.05
+MAX_KEY_LENGTH = 255
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# (status, raw headers, body)
+StoredResponse = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+
+class KeyReused(Exception):
+    """The key was already used with a different request body."""
+
+
+def _cacheable(status: int) -> bool:
+    return status < 500 and status != 409
+
+
+class InMemoryIdempotencyStore:
+    def __init__(self, max_entries: int = MAX_MEMORY_ENTRIES):
+        self._done: "OrderedDict[str, Tuple[datetime, str, StoredResponse]]" = OrderedDict()
+        self._running: Dict[str, Tuple[str, asyncio.Event]] = {}
+        self._max_entries = max_entries
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        """Stored response to replay, or None if the caller should run the request."""
+        while True:
+            entry = self._done.get(key)
+            if entry and entry[0] < datetime.utcnow():
+                del self._done[key]
+                entry = None
+            if entry:
+                if entry[1] != fingerprint:
+                    raise KeyReused()
+                self._done.move_to_end(key)
+                return entry[2]
+            running = self._running.get(key)
+            if running is None:
+                self._running[key] = (fingerprint, asyncio.Event())
+                return None
+            if running[0] != fingerprint:
+                raise KeyReused()
+            await running[1].wait()
+
+    async def complete(self, key: str, response: Optional[StoredResponse]) -> None:
+        fingerprint, finished = self._running.pop(key)
+        if response is not None:
+            self._done[key] = (datetime.utcnow() + timedelta(seconds=TTL_SECONDS), fingerprint, response)
+            while len(self._done) > self._max_entries:
+                self._done.popitem(last=False)
+        finished.set()
+
+
+class DatabaseIdempotencyStore:
+    """Claims a key by inserting its row; duplicates poll until it is filled in."""
+
+    PRUNE_EVERY = 500  # claims between sweeps of expired rows
+
+    def __init__(self):
+        self._claims = 0
+
+    def _prune(self) -> None:
+        with Session(get_engine()) as db:
+            db.exec(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at < datetime.utcnow()))
+            db.commit()
+
+    def _claim(self, key: str, fingerprint: str):
+        now = datetime.utcnow()
+        with Session(get_engine()) as db:
+            db.exec(delete(IdempotencyRecord).where(IdempotencyRecord.key == key, IdempotencyRecord.expires_at < now))
+            row = db.exec(select(IdempotencyRecord).where(IdempotencyRecord.key == key)).first()
+            if row is None:
+                db.add(IdempotencyRecord(
+                    key=key,
+                    fingerprint=fingerprint,
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=TTL_SECONDS),
+                ))
+                try:
+                    db.commit()
+                    return "run", None
+                except IntegrityError:
+                    return "wait", None
+            db.commit()
+            if row.fingerprint != fingerprint:
+                raise KeyReused()
+            if row.status is not None:
+                headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in json.loads(row.headers)]
+                return "replay", (row.status, headers, row.body or b"")
+            if row.created_at < now - timedelta(seconds=LOCK_SECONDS):
+                taken = db.exec(
+                    update(IdempotencyRecord)
+                    .where(IdempotencyRecord.id == row.id, IdempotencyRecord.created_at == row.created_at)
+                    .values(created_at=now)
+                )
+                db.commit()
+                if taken.rowcount == 1:
+                    return "run", None
+            return "wait", None
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        self._claims += 1
+        if self._claims % self.PRUNE_EVERY == 0:
+            await asyncio.to_thread(self._prune)
+        while True:
+            action, response = await asyncio.to_thread(self._claim, key, fingerprint)
+            if action == "run":
+                return None
+            if action == "replay":
+                return response
+            await asyncio.sleep(POLL_SECONDS)
+
+    def _complete(self, key: str, response: Optional[StoredResponse]) -> None:
+        with Session(get_engine()) as db:
+            if response is None:
+                db.exec(delete(IdempotencyRecord).where(IdempotencyRecord.key == key))
+            else:
+                status, headers, body = response
+                db.exec(update(IdempotencyRecord).where(IdempotencyRecord.key == key).values(
+                    status=status,
+                    headers=json.dumps([(k.decode("latin-1"), v.decode("latin-1")) for k, v in headers]),
+                    body=body,
+                ))
+            db.commit()
+
+    async def complete(self, key: str, response: Optional[StoredResponse]) -> None:
+        await asyncio.to_thread(self._complete, key, response)
+
+
+def _build_store():
+    backend = os.getenv("IDEMPOTENCY_STORE", "memory").lower()
+    if backend == "database":
+        return DatabaseIdempotencyStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown IDEMPOTENCY_STORE '{backend}' (expected memory|database).")
+    return InMemoryIdempotencyStore()
+
+
+idempotency_store = _build_store()
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware; requests without the header pass straight through."""
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or idempotency_store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            return await self.app(scope, receive, send)
+        client_key = dict(scope["headers"]).get(b"idempotency-key")
+        if client_key is None:
+            return await self.app(scope, receive, send)
+        if not client_key or len(client_key) > MAX_KEY_LENGTH:
+            response = JSONResponse({"detail": "Invalid Idempotency-Key header."}, status_code=400)
+            return await response(scope, receive, send)
+
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        fingerprint = hashlib.sha256(scope["query_string"] + b"\0" + body).hexdigest()
+        key = f"{scope['method']} {scope['path']} {client_key.decode('latin-1')}"
+
+        try:
+            stored = await self.store.claim(key, fingerprint)
+        except KeyReused:
+            response = JSONResponse(
+                {"detail": "Idempotency-Key was already used with a different request."}, status_code=422
+            )
+            return await response(scope, receive, send)
+        if stored is not None:
+            status, headers, stored_body = stored
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": headers + [(b"idempotent-replayed", b"true")],
+            })
+            return await send({"type": "http.response.body", "body": stored_body})
+
+        replayed = False
+
+        async def replay_receive():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        start, sent_chunks = None, []
+
+        async def capture_send(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                sent_chunks.append(message.get("body", b""))
+            await send(message)
+
+        result = None
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            if start is not None and _cacheable(start["status"]):
+                result = (start["status"], list(start.get("headers", [])), b"".join(sent_chunks))
+        finally:
+            await self.store.complete(key, result)
@@ -0,0 +1,85 @@
+"""
+Routers imported on first use.
+
+    include_lazy_router(app, "/admin", "app.routers.admin")
+
+adds a placeholder route that matches every path under `prefix`. The first
+request that reaches it imports the module, includes its `router` on the app
+and is dispatched to the matching real route; the placeholder then stops
+matching. Because the placeholder lives in `app.router.routes`, in-process
+dispatch (e.g. `/batch` sub-requests) loads it the same way. Building the
+OpenAPI schema loads every lazy router first, so `/docs` stays complete.
+"""
+import importlib
+import threading
+from typing import List
+
+from starlette.routing import BaseRoute, Match, NoMatchFound
+
+
+_lock = threading.Lock()
+
+
+def _route_path(scope) -> str:
+    # The path relative to the mount point, as the app's own routes see it.
+    path, root_path = scope["path"], scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        return path[len(root_path):]
+    return path
+
+
+class LazyRouter(BaseRoute):
+    def __init__(self, app, prefix: str, module: str):
+        self.app = app
+        self.prefix = prefix.rstrip("/")
+        self.module = module
+        self.routes: List[BaseRoute] = []
+        self.loaded = False
+
+    def load(self) -> None:
+        with _lock:
+            if self.loaded:
+                return
+            router = importlib.import_module(self.module).router
+            before = len(self.app.router.routes)
+            self.app.include_router(router)
+            self.routes = self.app.router.routes[before:]
+            self.app.openapi_schema = None
+            self.loaded = True
+
+    def matches(self, scope):
+        if self.loaded:
+            return Match.NONE, {}  # the real routes, later in the list, answer from now on
+        path = _route_path(scope)
+        if path != self.prefix and not path.startswith(self.prefix + "/"):
+            return Match.NONE, {}
+        self.load()
+        partial = None
+        for route in self.routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return match, child_scope
+            if match == Match.PARTIAL and partial is None:
+                partial = child_scope
+        if partial is not None:
+            return Match.PARTIAL, partial
+        return Match.NONE, {}
+
+    async def handle(self, scope, receive, send) -> None:
+        await scope["route"].handle(scope, receive, send)
+
+    def url_path_for(self, name: str, /, **path_params):
+        self.load()
+        raise NoMatchFound(name, path_params)  # the real routes are checked after this one
+
+
+def include_lazy_router(app, prefix: str, module: str) -> LazyRouter:
+    route = LazyRouter(app, prefix, module)
+    app.router.routes.append(route)
+    return route
+
+
+def load_lazy_routers(app) -> None:
+    for route in list(app.router.routes):
+        if isinstance(route, LazyRouter):
+            route.load()
@@ -0,0 +1,191 @@
+"""
+Leaderboard snapshot job.
+
+Computes the XP every user earned within the period (summed from
+`XPLedger` over the `(user, created_at)` index) and their current streak
+with set-based SQL, and writes them in bulk to `Leaderboard`, one row set
+per period:
+
+- daily:  period_start = today (UTC), refreshed on every run that day
+- weekly: period_start = Monday of the current week
+
+Rows are committed chunk by chunk under a staging period name
+(`daily~staging`), which readers never query, and swapped in with one
+short transaction at the end, so the job never holds the write lock for
+long. Every worker runs the job; a `JobLease` lets one run at a time and
+the others skip that round.
+
+Streaks use the gaps-and-islands trick over distinct study days from
+`Progress`: `day - ROW_NUMBER()` is constant within a run of consecutive
+days, so each run is one GROUP BY bucket. The current streak is the most
+recent run, matching `calculate_streak` in the home/progress routers.
+
+Run by the app every LEADERBOARD_SNAPSHOT_SECONDS (default 3600, 0 disables),
+or by hand:
+
+    python -m app.leaderboard_snapshot daily|weekly
+"""
+import asyncio
+import logging
+import os
+import sys
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import Date, cast, delete, insert, literal, update
+from sqlmodel import Session, func, select
+
+from app.database import get_engine, init_db
+from app.leases import lease
+from app.models import Leaderboard, Progress, User, XPLedger
+
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("daily", "weekly")
+SNAPSHOT_CHUNK_SIZE = 5000
+SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("LEADERBOARD_SNAPSHOT_SECONDS", "3600"))
+SNAPSHOT_LEASE_SECONDS = 1800
+
+
+def period_start_for(period: str, today: Optional[date] = None) -> date:
+    today = today or datetime.utcnow().date()
+    if period == "weekly":
+        return today - timedelta(days=today.weekday())
+    return today
+
+
+def period_end_for(period: str, period_start: date) -> date:
+    return period_start + timedelta(days=7 if period == "weekly" else 1)
+
+
+def _staging(period: str) -> str:
+    return f"{period}~staging"
+
+
+def _period_xp_query(usernames: List[str], start: date, end: date):
+    """`(user, xp)` earned in [start, end) for users in `usernames` with ledger entries."""
+    return (
+        select(XPLedger.user, func.sum(XPLedger.amount))
+        .where(XPLedger.user.in_(usernames))
+        .where(XPLedger.created_at >= datetime.combine(start, datetime.min.time()))
+        .where(XPLedger.created_at < datetime.combine(end, datetime.min.time()))
+        .group_by(XPLedger.user)
+    )
+
+
+def streaks_query(usernames: List[str]):
+    """`(user, current_streak)` for users in `usernames` with any progress."""
+    if get_engine().dialect.name == "sqlite":
+        day = func.date(Progress.date)
+        day_number = lambda col: func.julianday(col)  # noqa: E731
+    else:
+        day = cast(Progress.date, Date)
+        day_number = lambda col: col - cast(literal("1970-01-01"), Date)  # noqa: E731
+
+    days = (
+        select(Progress.user.label("user"), day.label("day"))
+        .where(Progress.user.in_(usernames))
+        .distinct()
+        .subquery()
+    )
+    islands = select(
+        days.c.user,
+        days.c.day,
+        (day_number(days.c.day) - func.row_number().over(partition_by=days.c.user, order_by=days.c.day)).label("grp"),
+    ).subquery()
+    runs = (
+        select(
+            islands.c.user,
+            func.count().label("length"),
+            func.row_number().over(
+                partition_by=islands.c.user, order_by=func.max(islands.c.day).desc()
+            ).label("recency"),
+        )
+        .group_by(islands.c.user, islands.c.grp)
+        .subquery()
+    )
+    return select(runs.c.user, runs.c.length).where(runs.c.recency == 1)
+
+
+def snapshot_leaderboard(period: str = "daily", chunk_size: int = SNAPSHOT_CHUNK_SIZE) -> int:
+    """
+    Replace the current period's snapshot. Returns the number of rows
+    written, or 0 when another worker is already running this period.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown leaderboard period '{period}' (expected one of {PERIODS}).")
+    with lease(f"leaderboard-snapshot-{period}", seconds=SNAPSHOT_LEASE_SECONDS) as held:
+        if not held:
+            logger.info("Leaderboard snapshot (%s) is running on another worker; skipped.", period)
+            return 0
+        return _write_snapshot(period, chunk_size)
+
+
+def _write_snapshot(period: str, chunk_size: int) -> int:
+    period_start = period_start_for(period)
+    period_end = period_end_for(period, period_start)
+    staging = _staging(period)
+    now = datetime.utcnow()
+    written = 0
+    last_username = ""
+
+    with Session(get_engine()) as db:
+        # Leftovers of a run that died before its swap.
+        db.exec(delete(Leaderboard).where(Leaderboard.period == staging))
+        db.commit()
+        while True:
+            usernames = db.exec(
+                select(User.username)
+                .where(User.username > last_username)
+                .order_by(User.username)
+                .limit(chunk_size)
+            ).all()
+            if not usernames:
+                break
+            earned: Dict[str, int] = dict(db.exec(_period_xp_query(usernames, period_start, period_end)).all())
+            streaks: Dict[str, int] = dict(db.exec(streaks_query(usernames)).all())
+            db.exec(insert(Leaderboard), params=[
+                {
+                    "user": username,
+                    "period": staging,
+                    "period_start": period_start,
+                    "total_xp": earned.get(username) or 0,
+                    "current_streak": streaks.get(username, 0),
+                    "last_updated": now,
+                }
+                for username in usernames
+            ])
+            db.commit()
+            written += len(usernames)
+            last_username = usernames[-1]
+
+        # Swap in one short transaction: readers see the old or the new set.
+        db.exec(delete(Leaderboard).where(Leaderboard.period == period, Leaderboard.period_start == period_start))
+        db.exec(update(Leaderboard).where(Leaderboard.period == staging).values(period=period))
+        db.commit()
+    return written
+
+
+def latest_period_start(session: Session, period: str) -> Optional[date]:
+    return session.exec(
+        select(func.max(Leaderboard.period_start)).where(Leaderboard.period == period)
+    ).one()
+
+
+async def run_periodically() -> None:
+    """Lifespan task: refresh every period's snapshot on an interval."""
+    while True:
+        for period in PERIODS:
+            try:
+                await asyncio.to_thread(snapshot_leaderboard, period)
+            except Exception:
+                logger.exception("Leaderboard snapshot (%s) failed.", period)
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in PERIODS:
+        sys.exit("usage: python -m app.leaderboard_snapshot daily|weekly")
+    init_db()
+    print(f"Wrote {snapshot_leaderboard(sys.argv[1])} {sys.argv[1]} leaderboard rows.")
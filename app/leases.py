@@ -0,0 +1,75 @@
+"""
+Cross-worker job leases.
+
+Every worker process runs the same startup and background code, so jobs that
+must happen once (seeding the question bank, the leaderboard snapshot, ...)
+take a named row in `JobLease` first. Acquiring is one guarded UPDATE (take
+over an expired lease) or one INSERT (first use), so exactly one worker wins
+on SQLite and Postgres alike; a crashed holder's lease simply runs out.
+
+    with lease("leaderboard-snapshot", seconds=600) as held:
+        if held:
+            ...
+"""
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.database import get_engine
+from app.models import JobLease
+
+
+POLL_SECONDS = 0.2
+
+
+def acquire(name: str, seconds: float) -> Optional[str]:
+    """Take the lease if it is free or expired. Returns the holder token, or None."""
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=seconds)
+    with Session(get_engine()) as db:
+        result = db.exec(
+            update(JobLease)
+            .where(JobLease.name == name)
+            .where(JobLease.expires_at < now)
+            .values(holder=token, expires_at=expires_at)
+        )
+        if result.rowcount == 1:
+            db.commit()
+            return token
+        db.add(JobLease(name=name, holder=token, expires_at=expires_at))
+        try:
+            db.commit()
+        except IntegrityError:
+            return None  # held by another worker
+    return token
+
+
+def release(name: str, token: str) -> None:
+    with Session(get_engine()) as db:
+        db.exec(delete(JobLease).where(JobLease.name == name).where(JobLease.holder == token))
+        db.commit()
+
+
+@contextmanager
+def lease(name: str, seconds: float = 60, wait: float = 0) -> Iterator[bool]:
+    """
+    Hold `name` for the block; yields False if another worker still holds it
+    after `wait` seconds. Keep `seconds` above the job's worst-case runtime.
+    """
+    deadline = time.monotonic() + wait
+    token = acquire(name, seconds)
+    while token is None and time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        token = acquire(name, seconds)
+    try:
+        yield token is not None
+    finally:
+        if token is not None:
+            release(name, token)
@@ -1,8 +1,15 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from app.database import init_db
-from app.routers import bossbattle, home, progress, users
+from app.idempotency import IdempotencyMiddleware
+from app.metrics import MetricsMiddleware
+from app.profiling import ProfilingMiddleware
+from app.read_routing import ReadRoutingMiddleware
+from app.leaderboard_snapshot import SNAPSHOT_INTERVAL_SECONDS, run_periodically as run_leaderboard_snapshots
+from app.lazy_router import include_lazy_router, load_lazy_routers
+from app.routers import batch, bossbattle, home, progress, users
 
 try:
     from app.routers import quests
@@ -24,7 +31,14 @@ except ImportError:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    # The question bank and the XP ranking load on first use, keeping a fresh
+    # (serverless) instance's startup down to the schema version check.
+    bossbattle.reaper.start()
+    snapshots = asyncio.create_task(run_leaderboard_snapshots()) if SNAPSHOT_INTERVAL_SECONDS > 0 else None
     yield
+    if snapshots:
+        snapshots.cancel()
+    await bossbattle.reaper.stop()
 
 app = FastAPI(
     title="StudyQuest Backend API",
@@ -42,6 +56,10 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.add_middleware(ProfilingMiddleware)  # innermost: profiles only the handler's own work
+app.add_middleware(ReadRoutingMiddleware)
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(MetricsMiddleware)  # added last = outermost, so it times everything
 
 app.include_router(home.router)
 app.include_router(progress.router)
@@ -49,6 +67,7 @@ if quests and hasattr(quests, "router"):
     app.include_router(quests.router)
 app.include_router(bossbattle.router)
 app.include_router(users.router)
+app.include_router(batch.router)
 if cosmetics and hasattr(cosmetics, "router"):
     app.include_router(cosmetics.router)
 if text_ai and hasattr(text_ai, "router"):
@@ -56,6 +75,20 @@ if text_ai and hasattr(text_ai, "router"):
 if social and hasattr(social, "router"):
     app.include_router(social.router)
 
+# Rarely hit on a fresh (serverless) instance: imported by their first request.
+include_lazy_router(app, "/sync", "app.routers.sync")
+include_lazy_router(app, "/metrics", "app.routers.metrics")
+include_lazy_router(app, "/admin", "app.routers.admin")
+
+_build_openapi = app.openapi
+
+
+def _openapi():
+    load_lazy_routers(app)
+    return _build_openapi()
+
+
+app.openapi = _openapi
 
 
 @app.get("/", tags=["Root"])
@@ -0,0 +1,210 @@
+"""
+Request and database metrics, rendered in Prometheus text format at `/metrics`.
+
+- `MetricsMiddleware` times every HTTP request into a per-route latency
+  histogram (labelled by route template, e.g. `/users/{username}`).
+- Engine-wide cursor events count statements and DB time. The counts are
+  attributed to the current request through a context variable, which also
+  follows handlers into the threadpool.
+- A request that runs the same SQL statement `N_PLUS_ONE_THRESHOLD` or more
+  times is counted (and logged once per route/statement) as a likely N+1.
+
+Hot-path cost is a few dict updates under one lock per request and two
+`perf_counter()` calls per statement.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+N_PLUS_ONE_THRESHOLD = 5
+
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_seconds", "statements")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Dict[str, int] = {}
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_route() -> Optional[str]:
+    """`METHOD /route/{template}` of the request being served, if any."""
+    stats = _current.get()
+    if stats is None:
+        return None
+    route = getattr(stats.scope.get("route"), "path", stats.scope["path"])
+    return f"{stats.scope['method']} {route}"
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[str, Histogram] = {}
+        self.queries: Dict[str, int] = {}
+        self.db_seconds: Dict[str, float] = {}
+        self.n_plus_one: Dict[str, int] = {}
+        self._reported: set = set()
+        self.background_queries = 0
+        self.background_db_seconds = 0.0
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        repeated = [sql for sql, n in stats.statements.items() if n >= N_PLUS_ONE_THRESHOLD]
+        with self._lock:
+            key = (method, route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.get(route)
+            if histogram is None:
+                histogram = self.latency[route] = Histogram()
+            histogram.observe(seconds)
+            self.queries[route] = self.queries.get(route, 0) + stats.queries
+            self.db_seconds[route] = self.db_seconds.get(route, 0.0) + stats.db_seconds
+            if repeated:
+                self.n_plus_one[route] = self.n_plus_one.get(route, 0) + 1
+            new = [sql for sql in repeated if (route, sql) not in self._reported]
+            self._reported.update((route, sql) for sql in new)
+        for sql in new:
+            logger.warning(
+                "Possible N+1 on %s %s: ran %d times in one request: %s",
+                method, route, stats.statements[sql], " ".join(sql.split())[:300],
+            )
+
+    def record_background_query(self, seconds: float) -> None:
+        with self._lock:
+            self.background_queries += 1
+            self.background_db_seconds += seconds
+
+    def render(self, extra: List[str] = ()) -> str:
+        """Prometheus text exposition format (v0.0.4)."""
+        with self._lock:
+            requests = dict(self.requests)
+            latency = {route: (list(h.counts), h.total, h.count) for route, h in self.latency.items()}
+            queries, db_seconds, n_plus_one = dict(self.queries), dict(self.db_seconds), dict(self.n_plus_one)
+            background = (self.background_queries, self.background_db_seconds)
+
+        lines = [
+            "# HELP studyquest_http_requests_total HTTP requests by route and status.",
+            "# TYPE studyquest_http_requests_total counter",
+        ]
+        for (method, route, status), n in sorted(requests.items()):
+            lines.append(f'studyquest_http_requests_total{{method="{method}",route="{route}",status="{status}"}} {n}')
+
+        lines += [
+            "# HELP studyquest_http_request_duration_seconds Request latency by route.",
+            "# TYPE studyquest_http_request_duration_seconds histogram",
+        ]
+        for route, (counts, total, count) in sorted(latency.items()):
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, counts):
+                cumulative += n
+                lines.append(f'studyquest_http_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+            lines.append(f'studyquest_http_request_duration_seconds_bucket{{route="{route}",le="+Inf"}} {count}')
+            lines.append(f'studyquest_http_request_duration_seconds_sum{{route="{route}"}} {total:.6f}')
+            lines.append(f'studyquest_http_request_duration_seconds_count{{route="{route}"}} {count}')
+
+        lines += [
+            "# HELP studyquest_db_queries_total SQL statements executed, by route (\"\" = background jobs).",
+            "# TYPE studyquest_db_queries_total counter",
+        ]
+        lines += [f'studyquest_db_queries_total{{route="{r}"}} {n}' for r, n in sorted(queries.items())]
+        lines.append(f'studyquest_db_queries_total{{route=""}} {background[0]}')
+        lines += [
+            "# HELP studyquest_db_seconds_total Time spent in SQL statements, by route.",
+            "# TYPE studyquest_db_seconds_total counter",
+        ]
+        lines += [f'studyquest_db_seconds_total{{route="{r}"}} {s:.6f}' for r, s in sorted(db_seconds.items())]
+        lines.append(f'studyquest_db_seconds_total{{route=""}} {background[1]:.6f}')
+        lines += [
+            f"# HELP studyquest_n_plus_one_requests_total Requests that ran one statement {N_PLUS_ONE_THRESHOLD}+ times.",
+            "# TYPE studyquest_n_plus_one_requests_total counter",
+        ]
+        lines += [f'studyquest_n_plus_one_requests_total{{route="{r}"}} {n}' for r, n in sorted(n_plus_one.items())]
+        return "\n".join(lines + list(extra)) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request against its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            registry.record_request(scope["method"], route, status, time.perf_counter() - started, stats)
+
+
+# ------------------------------------------------------------------
+# 🔹 SQL instrumentation (every engine)
+# ------------------------------------------------------------------
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "handle_error")
+def _failed_query(exception_context) -> None:
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is None:
+        registry.record_background_query(elapsed)
+        return
+    stats.queries += 1
+    stats.db_seconds += elapsed
+    stats.statements[statement] = stats.statements.get(statement, 0) + 1
@@ -0,0 +1,197 @@
+"""
+Idempotent schema migrations run by `init_db()` after `create_all`.
+
+`create_all` only creates missing tables, so columns and indexes added to
+models later are brought onto existing databases here, followed by one-off
+data fixes. Every step is safe to run on each startup, but `init_db()` only
+runs them when `schema_fingerprint()` differs from the version recorded in
+`SchemaVersion`. Workers that start together serialize on the
+"schema-sync" `JobLease` (see `migration_lock`), so only one of them migrates.
+"""
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import insert, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DatabaseError, OperationalError, ProgrammingError
+from sqlmodel import SQLModel
+
+import app.models  # noqa: F401  (registers every table on SQLModel.metadata)
+from app.models import JobLease, SchemaVersion
+
+
+MIGRATION_LEASE_SECONDS = 600
+
+
+def _add_missing_columns(engine: Engine) -> None:
+    """Add model columns missing from existing tables (as nullable columns)."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'))
+
+
+def _canonicalize_friend_pairs(engine: Engine) -> None:
+    """
+    Store every friendship once as (lower username, higher username).
+    The original sender is kept in `requester` so pending/blocked still know
+    who asked. Duplicate rows for one pair keep blocked over accepted over
+    pending, then the oldest.
+    """
+    with engine.begin() as conn:
+        conn.execute(text('UPDATE friend SET requester = "user" WHERE requester IS NULL'))
+        # Both SQLite and Postgres evaluate every SET expression against the old row.
+        conn.execute(text(
+            'UPDATE friend SET "user" = friend_username, friend_username = "user" '
+            'WHERE "user" > friend_username'
+        ))
+        conn.execute(text(
+            'DELETE FROM friend WHERE id IN ('
+            ' SELECT id FROM ('
+            '  SELECT id, ROW_NUMBER() OVER ('
+            '   PARTITION BY "user", friend_username'
+            "   ORDER BY CASE status WHEN 'blocked' THEN 0 WHEN 'accepted' THEN 1 ELSE 2 END, id"
+            '  ) AS rn FROM friend'
+            ' ) ranked WHERE rn > 1)'
+        ))
+
+
+def _backfill_xp_ledger(engine: Engine) -> None:
+    """
+    Seed an empty XP ledger from the tables that recorded XP before it
+    existed, then make every `User.total_xp` counter equal its ledger sum.
+    Previously only boss battles (and registration) fed `User.total_xp`, so
+    whatever is not explained by boss battles becomes an "opening" entry.
+    """
+    known_user = 'IN (SELECT username FROM "user")'
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM xpledger LIMIT 1")).first():
+            return
+        for source, table, user_col, amount_col, date_col, extra in (
+            ("progress", "progress", '"user"', "xp_gained", '"date"', ""),
+            ("reflection", "textaireflection", '"user"', "xp_reward", '"date"', ""),
+            ("boss", "bossbattle", '"user"', "xp_reward", '"date"', ""),
+            ("quest", "quest", "assigned_to", "xp_reward", "NULL", " AND completed"),
+        ):
+            conn.execute(text(
+                f'INSERT INTO xpledger ("user", amount, source, ref_id, created_at) '
+                f"SELECT {user_col}, {amount_col}, '{source}', id, COALESCE({date_col}, CURRENT_TIMESTAMP) "
+                f"FROM {table} WHERE {amount_col} <> 0 AND {user_col} {known_user}{extra}"
+            ))
+        conn.execute(text(
+            'INSERT INTO xpledger ("user", amount, source, ref_id, created_at) '
+            "SELECT username, opening, 'opening', NULL, join_date FROM ("
+            ' SELECT u.username, u.join_date, COALESCE(u.total_xp, 0) - COALESCE('
+            '  (SELECT SUM(b.xp_reward) FROM bossbattle b WHERE b."user" = u.username), 0'
+            ' ) AS opening FROM "user" u'
+            ") balances WHERE opening <> 0"
+        ))
+        conn.execute(text(
+            'UPDATE "user" SET total_xp = ('
+            ' SELECT COALESCE(SUM(amount), 0) FROM xpledger WHERE xpledger."user" = "user".username)'
+        ))
+
+
+def _backfill_updated_at(engine: Engine) -> None:
+    """Rows that predate the `updated_at` columns count as changed now."""
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if "updated_at" in table.c:
+                conn.execute(update(table).where(table.c.updated_at.is_(None)).values(updated_at=now))
+
+
+def _lowercase_boss_difficulty(engine: Engine) -> None:
+    """Boss battle difficulty is matched case-sensitively by the leaderboard."""
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE bossbattle SET difficulty = LOWER(difficulty) WHERE difficulty <> LOWER(difficulty)"))
+
+
+def _create_missing_indexes(engine: Engine) -> None:
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def _create_postgres_pattern_indexes(engine: Engine) -> None:
+    """Btree with text_pattern_ops so `username LIKE 'prefix%'` can use an index."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_user_username_pattern ON "user" (username text_pattern_ops)'
+        ))
+
+
+STEPS = (
+    _add_missing_columns,
+    _canonicalize_friend_pairs,
+    _backfill_xp_ledger,
+    _backfill_updated_at,
+    _lowercase_boss_difficulty,
+    # Last, so unique indexes are built on already de-duplicated data.
+    _create_missing_indexes,
+    _create_postgres_pattern_indexes,
+)
+
+
+def run_migrations(engine: Engine) -> None:
+    for step in STEPS:
+        step(engine)
+
+
+def schema_fingerprint() -> str:
+    """
+    Hash of every table, column and index on the models plus the migration
+    steps, so any model change or new step yields a new version.
+    """
+    parts = [step.__name__ for step in STEPS]
+    for table in SQLModel.metadata.sorted_tables:
+        parts.append(table.name)
+        parts += [f"{c.name}:{c.type}:{c.nullable}:{c.primary_key}" for c in table.columns]
+        parts += sorted(
+            f"{i.name}:{','.join(c.name for c in i.columns)}:{i.unique}" for i in table.indexes
+        )
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+
+def applied_version(engine: Engine) -> Optional[str]:
+    """Version recorded by the last `init_db()`, or None (e.g. a new database)."""
+    version_table = SchemaVersion.__table__
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                select(version_table.c.version).order_by(version_table.c.id.desc()).limit(1)
+            ).scalar()
+    except (OperationalError, ProgrammingError):  # table does not exist yet
+        return None
+
+
+@contextmanager
+def migration_lock(engine: Engine) -> Iterator[None]:
+    """Hold the schema-sync lease, waiting while another worker migrates."""
+    from app.leases import lease
+
+    try:
+        JobLease.__table__.create(engine, checkfirst=True)
+    except DatabaseError:
+        pass  # another worker created it between the check and the CREATE
+    with lease("schema-sync", seconds=MIGRATION_LEASE_SECONDS, wait=MIGRATION_LEASE_SECONDS) as held:
+        if not held:
+            raise RuntimeError("Timed out waiting for another worker's schema migration.")
+        yield
+
+
+def record_version(engine: Engine, version: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(insert(SchemaVersion.__table__).values(version=version, applied_at=datetime.utcnow()))
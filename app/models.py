@@ -1,6 +1,12 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
+
+
+def _updated_at(index: bool = False):
+    """Row change time, bumped on every UPDATE (read by `/sync`)."""
+    return Field(default_factory=datetime.utcnow, index=index, sa_column_kwargs={"onupdate": datetime.utcnow})
 
 
 # ------------------------------------------------------------------
@@ -15,7 +21,25 @@ class User(SQLModel, table=True):
     username: str = Field(index=True, unique=True)
     email: Optional[str] = None
     join_date: datetime = Field(default_factory=datetime.utcnow)
-    total_xp: int = 0
+    total_xp: int = Field(default=0, index=True)
+    updated_at: datetime = _updated_at()
+
+
+class XPLedger(SQLModel, table=True):
+    """
+    Append-only record of every XP change (positive or negative).
+    `User.total_xp` is the maintained sum of a user's entries.
+    """
+    __table_args__ = (
+        Index("ix_xpledger_user_created_at", "user", "created_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user: str = Field(foreign_key="user.username")
+    amount: int
+    source: str  # progress | quest | boss | reflection | opening
+    ref_id: Optional[int] = None  # id of the row that earned the XP, if any
+    created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 # ------------------------------------------------------------------
@@ -25,12 +49,17 @@ class Progress(SQLModel, table=True):
     """
     Stores user study sessions and reflection data.
     """
+    __table_args__ = (
+        Index("ix_progress_user_updated_at", "user", "updated_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user: str = Field(index=True)
     date: datetime = Field(default_factory=datetime.utcnow)
     duration_minutes: int
     xp_gained: int = 0
     reflection: Optional[str] = None
+    updated_at: datetime = _updated_at()
 
 
 # ------------------------------------------------------------------
@@ -40,6 +69,10 @@ class Quest(SQLModel, table=True):
     """
     Represents a gamified learning quest with XP rewards.
     """
+    __table_args__ = (
+        Index("ix_quest_assigned_to_updated_at", "assigned_to", "updated_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     description: str
@@ -47,6 +80,7 @@ class Quest(SQLModel, table=True):
     xp_reward: int
     completed: bool = False
     assigned_to: Optional[str] = Field(default=None, foreign_key="user.username")
+    updated_at: datetime = _updated_at()
 
 
 class Level(SQLModel, table=True):
@@ -67,6 +101,10 @@ class Avatar(SQLModel, table=True):
     """
     Customizable avatar (theme, outfit, accessories).
     """
+    __table_args__ = (
+        Index("ix_avatar_user_updated_at", "user", "updated_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user: str = Field(index=True)
     avatar_name: Optional[str] = None
@@ -74,6 +112,7 @@ class Avatar(SQLModel, table=True):
     outfit: Optional[str] = None
     accessory: Optional[str] = None
     theme: str = "default"  # e.g., "dark", "fantasy", "neon"
+    updated_at: datetime = _updated_at()
 
 
 class Badge(SQLModel, table=True):
@@ -85,6 +124,7 @@ class Badge(SQLModel, table=True):
     description: str
     xp_required: int
     icon_url: Optional[str] = None
+    updated_at: datetime = _updated_at(index=True)
 
 
 # ------------------------------------------------------------------
@@ -95,6 +135,10 @@ class TextAIReflection(SQLModel, table=True):
     Stores text reflections analyzed by the AI mentor.
     Used by all team members to provide feedback and summaries.
     """
+    __table_args__ = (
+        Index("ix_textaireflection_user_updated_at", "user", "updated_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user: str = Field(index=True)
     date: datetime = Field(default_factory=datetime.utcnow)
@@ -102,6 +146,7 @@ class TextAIReflection(SQLModel, table=True):
     ai_feedback: Optional[str] = None
     summary: Optional[str] = None
     xp_reward: int = 0
+    updated_at: datetime = _updated_at()
 
 
 # ------------------------------------------------------------------
@@ -111,36 +156,180 @@ class BossBattle(SQLModel, table=True):
     """
     End-of-day AI quiz challenge for XP and leaderboard ranking.
     """
+    __table_args__ = (
+        # The day's range (after equality on difficulty, for a per-difficulty
+        # board); user and score make the per-user best-score grouping index-only.
+        Index("ix_bossbattle_date_user_score", "date", "user", "score"),
+        Index("ix_bossbattle_difficulty_date_user_score", "difficulty", "date", "user", "score"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user: str = Field(index=True)
     date: datetime = Field(default_factory=datetime.utcnow)
     score: int = 0
     total_questions: int = 5
     xp_reward: int = 0
-    difficulty: str = "medium"
+    difficulty: str = "medium"  # stored lower-case
     completed: bool = False
 
 
+class BossQuestion(SQLModel, table=True):
+    """
+    Multiple-choice question served during boss battles.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    question: str
+    choices: str  # JSON-encoded list of answer strings
+    answer_idx: int
+    difficulty: str = Field(default="medium", index=True)  # easy | medium | hard
+    topic: str = Field(default="general", index=True)
+    updated_at: datetime = _updated_at()
+
+
+class BossBattleSession(SQLModel, table=True):
+    """
+    Live (in-progress) boss battle shared by every worker process.
+    `version` is bumped on each write for optimistic concurrency.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user: str = Field(index=True, unique=True)
+    state: str  # JSON-encoded battle state
+    version: int = 1
+    expires_at: datetime = Field(index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# ------------------------------------------------------------------
+# 🔹 Idempotency Keys
+# ------------------------------------------------------------------
+class IdempotencyRecord(SQLModel, table=True):
+    """
+    Stored response for a write sent with an `Idempotency-Key` header.
+    `status` is None while the first request is still running.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    key: str = Field(index=True, unique=True)  # "<METHOD> <path> <client key>"
+    fingerprint: str  # hash of the query string + body the key was first used with
+    status: Optional[int] = None
+    headers: Optional[str] = None  # JSON-encoded [[name, value], ...]
+    body: Optional[bytes] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+
 # ------------------------------------------------------------------
 # 🔹 Mohamad — Social Features
 # ------------------------------------------------------------------
 class Friend(SQLModel, table=True):
     """
     Represents friendship between users.
+    Each pair is stored once in canonical order (`user` < `friend_username`);
+    `requester` records who sent the request.
     """
+    __table_args__ = (
+        Index("ux_friend_pair", "user", "friend_username", unique=True),
+        Index("ix_friend_user_status", "user", "status"),
+        Index("ix_friend_friend_username_status", "friend_username", "status"),
+        Index("ix_friend_user_updated_at", "user", "updated_at"),
+        Index("ix_friend_friend_username_updated_at", "friend_username", "updated_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user: str = Field(index=True)
     friend_username: str = Field(index=True)
+    requester: Optional[str] = None
     since: datetime = Field(default_factory=datetime.utcnow)
     status: str = "accepted"  # pending | accepted | blocked
+    updated_at: datetime = _updated_at()
+
+
+class ActivityEvent(SQLModel, table=True):
+    """
+    Something a user did that their friends can see in their feed.
+    `fanned_out` is False for very high-degree actors, whose events are
+    merged into followers' feeds at read time instead of copied.
+    """
+    __table_args__ = (
+        Index("ix_activityevent_fanned_out_actor_id", "fanned_out", "actor", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    actor: str = Field(index=True)
+    kind: str  # progress | quest | boss | reflection
+    payload: str  # JSON-encoded event details
+    fanned_out: bool = True
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class FeedItem(SQLModel, table=True):
+    """
+    One entry in a user's feed inbox (fan-out-on-write copy of an event id).
+    """
+    __table_args__ = (
+        Index("ux_feeditem_owner_event", "owner", "event_id", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    owner: str
+    event_id: int = Field(foreign_key="activityevent.id")
 
 
 class Leaderboard(SQLModel, table=True):
     """
-    Tracks top users by total XP and streak.
+    Tracks top users by XP earned in the period, and streak.
+    Rows are written in bulk by the snapshot job, one set per
+    (`period`, `period_start`): "daily" or "weekly" (week starting Monday).
     """
+    __table_args__ = (
+        Index("ux_leaderboard_period_user", "period", "period_start", "user", unique=True),
+        Index("ix_leaderboard_period_ranking", "period", "period_start", "total_xp", "current_streak"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user: str = Field(index=True)
+    period: str = "daily"  # daily | weekly
+    period_start: Optional[date] = None
     total_xp: int = 0
     current_streak: int = 0
     last_updated: datetime = Field(default_factory=datetime.utcnow)
+
+
+# ------------------------------------------------------------------
+# 🔹 Delta Sync
+# ------------------------------------------------------------------
+class Tombstone(SQLModel, table=True):
+    """
+    Marks a deleted row so `/sync` clients can drop it too.
+    `owner` is the user whose sync should see the delete (None = everyone).
+    """
+    __table_args__ = (
+        Index("ix_tombstone_owner_deleted_at", "owner", "deleted_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    table_name: str
+    row_id: int
+    owner: Optional[str] = None
+    deleted_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# ------------------------------------------------------------------
+# 🔹 Schema bookkeeping
+# ------------------------------------------------------------------
+class SchemaVersion(SQLModel, table=True):
+    """
+    Fingerprint of the schema `init_db()` last brought the database to.
+    Startup skips `create_all` and the migrations while it still matches.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    version: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class JobLease(SQLModel, table=True):
+    """
+    Named lease on a job that only one worker may run at a time
+    (see app/leases.py). `holder` is a random token per acquisition.
+    """
+    name: str = Field(primary_key=True)
+    holder: str
+    expires_at: datetime
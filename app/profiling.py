@@ -0,0 +1,184 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries `X-Profile-Token: <PROFILE_TOKEN>`, or
+at random with probability `PROFILE_SAMPLE_RATE` (default 0 = never). While
+it runs, a sampler thread snapshots the stack of the thread executing its
+endpoint every `PROFILE_INTERVAL_MS` (default 5) and every SQL statement is
+timed. Afterwards two files are written to `PROFILE_DIR` (default
+./profiles), named after the response's `X-Profile-Id` header:
+
+- `<id>.folded`: collapsed stacks (`frame;frame;frame count`), ready for
+  flamegraph.pl or https://www.speedscope.app
+- `<id>.json`: route, timings and the SQL statements with their durations
+
+When a request is not profiled the cost is one random draw (if sampling is
+on) and one context-variable read per SQL statement.
+
+Threads are picked by finding the endpoint's code on their stack. The first
+SQL statement pins the exact worker thread, so concurrent requests to the
+same endpoint are only mixed in before the handler's first query.
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+INTERVAL_SECONDS = int(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+MAX_STATEMENTS = 1000
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.endpoint_codes: set = set()
+        self.thread_id: Optional[int] = None  # pinned by the first SQL statement
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.statements: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self, scope) -> None:
+        self._scope = scope
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+        self._resolve_endpoint()
+
+    def _resolve_endpoint(self) -> None:
+        self.route = getattr(self._scope.get("route"), "path", None)
+        endpoint = self._scope.get("endpoint")
+        # Unwrap decorators such as @cached: their wrapper code is shared by
+        # many endpoints, the innermost function's code is not.
+        while hasattr(endpoint, "__wrapped__"):
+            endpoint = endpoint.__wrapped__
+        code = getattr(endpoint, "__code__", None)
+        if code is not None:
+            self.endpoint_codes.add(code)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(INTERVAL_SECONDS):
+            if not self.endpoint_codes:
+                self._resolve_endpoint()
+                if not self.endpoint_codes:
+                    continue
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_id is not None and thread_id != self.thread_id):
+                    continue
+                stack, in_endpoint = [], False
+                while frame is not None:
+                    code = frame.f_code
+                    in_endpoint = in_endpoint or code in self.endpoint_codes
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if in_endpoint:
+                    self.stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def report(self, status: int) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "samples": self.samples,
+            "interval_ms": INTERVAL_SECONDS * 1000,
+            "sql_total_ms": round(sum(s["duration_ms"] for s in self.statements), 3),
+            "statements": self.statements,
+        }
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def _save(profile_id: str, profile: RequestProfile, status: int) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, profile_id)
+    with open(base + ".folded", "w", encoding="utf-8") as fh:
+        for stack, count in profile.stacks.most_common():
+            fh.write(f"{stack} {count}\n")
+    with open(base + ".json", "w", encoding="utf-8") as fh:
+        json.dump(profile.report(status), fh, indent=2, default=str)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    def _wanted(self, scope) -> bool:
+        if PROFILE_TOKEN:
+            token = dict(scope["headers"]).get(b"x-profile-token")
+            if token is not None and token.decode("latin-1") == PROFILE_TOKEN:
+                return True
+        return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        profile_id = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{scope['method']}-{scope['path'].strip('/').replace('/', '_') or 'root'}"
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        token = _current.set(profile)
+        profile.start(scope)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.stop()
+            _current.reset(token)
+            await asyncio.to_thread(_save, profile_id, profile, status)
+
+
+# ------------------------------------------------------------------
+# 🔹 SQL capture (only does work inside a profiled request)
+# ------------------------------------------------------------------
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    profile = _current.get()
+    if profile is not None:
+        context._profile_started = time.perf_counter()
+        if profile.thread_id is None:
+            profile.thread_id = threading.get_ident()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    profile = _current.get()
+    if profile is None or len(profile.statements) >= MAX_STATEMENTS:
+        return
+    profile.statements.append({
+        "sql": " ".join(statement.split()),
+        "parameters": repr(parameters)[:500],
+        "duration_ms": round((time.perf_counter() - context._profile_started) * 1000, 3),
+    })
@@ -0,0 +1,248 @@
+"""
+Boss battle question bank.
+
+Questions live in the `BossQuestion` table and are loaded (on the first battle,
+not at startup) into id arrays
+indexed by difficulty, topic and (difficulty, topic), so each battle draws a
+non-repeating random sample with `random.sample` in O(k) instead of
+`ORDER BY RANDOM()` over the whole table. A question missing from the
+snapshot (drawn on another worker since the last reload) is fetched by
+primary key.
+
+Bulk import from the command line:
+
+    python -m app.question_bank questions.json   # list of objects
+    python -m app.question_bank questions.csv    # question,choices,answer_idx,difficulty,topic
+                                                 # (choices separated by "|")
+"""
+import csv
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlmodel import Session, func, select
+
+from app.database import get_engine, init_db
+from app.leases import lease
+from app.models import BossQuestion
+
+
+IMPORT_CHUNK_SIZE = 1000
+RELOAD_CHECK_SECONDS = 30
+
+_DEFAULT_QUESTIONS = [
+    {
+        "question": "What is the time complexity of binary search?",
+        "choices": ["O(n)", "O(log n)", "O(n log n)", "O(1)"],
+        "answer_idx": 1,
+    },
+    {
+        "question": "Which HTTP method is idempotent?",
+        "choices": ["POST", "PUT", "PATCH", "CONNECT"],
+        "answer_idx": 1,
+    },
+    {
+        "question": "What does SQL stand for?",
+        "choices": [
+            "Simple Query Language",
+            "Structured Query Language",
+            "Sequential Query Language",
+            "System Query Language",
+        ],
+        "answer_idx": 1,
+    },
+    {
+        "question": "Which data structure uses FIFO order?",
+        "choices": ["Stack", "Queue", "Tree", "Heap"],
+        "answer_idx": 1,
+    },
+    {
+        "question": "Which status code means 'Not Found'?",
+        "choices": ["200", "301", "404", "500"],
+        "answer_idx": 2,
+    },
+]
+
+
+class QuestionBank:
+    """In-memory snapshot of `BossQuestion`, rebuilt whenever the table changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._first_load = threading.Lock()
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._all: List[int] = []
+        self._by_difficulty: Dict[str, List[int]] = {}
+        self._by_topic: Dict[str, List[int]] = {}
+        self._by_pair: Dict[Tuple[str, str], List[int]] = {}
+        self._signature: Optional[Tuple[int, int, Optional[datetime]]] = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def _current_signature(db: Session) -> Tuple[int, int, Optional[datetime]]:
+        # count and max(id) catch inserts and deletes; max(updated_at) catches edits.
+        count, max_id, last_update = db.exec(
+            select(func.count(BossQuestion.id), func.max(BossQuestion.id), func.max(BossQuestion.updated_at))
+        ).one()
+        return count or 0, max_id or 0, last_update
+
+    @staticmethod
+    def _entry(row: BossQuestion) -> Dict[str, Any]:
+        return {
+            "question": row.question,
+            "choices": json.loads(row.choices),
+            "answer_idx": row.answer_idx,
+        }
+
+    def load(self) -> None:
+        """(Re)build the id arrays from the table."""
+        with Session(get_engine()) as db:
+            signature = self._current_signature(db)
+            rows = db.exec(select(BossQuestion)).all()
+
+        by_id, by_difficulty, by_topic, by_pair = {}, {}, {}, {}
+        for row in rows:
+            by_id[row.id] = self._entry(row)
+            difficulty, topic = row.difficulty.lower(), row.topic.lower()
+            by_difficulty.setdefault(difficulty, []).append(row.id)
+            by_topic.setdefault(topic, []).append(row.id)
+            by_pair.setdefault((difficulty, topic), []).append(row.id)
+
+        with self._lock:
+            self._by_id = by_id
+            self._all = list(by_id)
+            self._by_difficulty = by_difficulty
+            self._by_topic = by_topic
+            self._by_pair = by_pair
+            self._signature = signature
+            self._checked_at = time.monotonic()
+
+    def ensure_fresh(self) -> None:
+        """
+        Seed and load the bank on first use; afterwards reload if another
+        process changed it (checked at most every 30s).
+        """
+        if self._signature is None:
+            with self._first_load:
+                if self._signature is None:
+                    load_question_bank()
+            return
+        if time.monotonic() - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        with Session(get_engine()) as db:
+            signature = self._current_signature(db)
+        if signature != self._signature:
+            self.load()
+        else:
+            self._checked_at = time.monotonic()
+
+    def _pool(self, difficulty: Optional[str], topic: Optional[str]) -> List[int]:
+        difficulty = difficulty.lower() if difficulty else None
+        topic = topic.lower() if topic else None
+        if difficulty and topic:
+            pool = self._by_pair.get((difficulty, topic))
+            # Fall back to any difficulty when the topic has none at this level.
+            return pool or self._by_topic.get(topic, [])
+        if topic:
+            return self._by_topic.get(topic, [])
+        if difficulty:
+            return self._by_difficulty.get(difficulty) or self._all
+        return self._all
+
+    def sample(self, k: int, difficulty: Optional[str] = None, topic: Optional[str] = None) -> List[int]:
+        """Pick up to `k` distinct question ids."""
+        with self._lock:
+            pool = self._pool(difficulty, topic)
+            return random.sample(pool, min(k, len(pool)))
+
+    def get(self, question_id: int) -> Optional[Dict[str, Any]]:
+        """The question, or None if it has been deleted from the bank."""
+        question = self._by_id.get(question_id)
+        if question is None:
+            with Session(get_engine()) as db:
+                row = db.get(BossQuestion, question_id)
+            if row is None:
+                return None
+            question = self._entry(row)
+            with self._lock:
+                self._by_id[question_id] = question
+        return question
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+
+question_bank = QuestionBank()
+
+
+def _to_row(item: Dict[str, Any]) -> Dict[str, Any]:
+    choices = item["choices"]
+    if isinstance(choices, str):
+        choices = choices.split("|")
+    answer_idx = int(item["answer_idx"])
+    if not 0 <= answer_idx < len(choices):
+        raise ValueError(f"answer_idx out of range for question: {item['question']!r}")
+    return {
+        "question": item["question"],
+        "choices": json.dumps(choices),
+        "answer_idx": answer_idx,
+        "difficulty": (item.get("difficulty") or "medium").lower(),
+        "topic": (item.get("topic") or "general").lower(),
+    }
+
+
+def import_questions(items: Iterable[Dict[str, Any]], chunk_size: int = IMPORT_CHUNK_SIZE) -> int:
+    """Insert questions with chunked multi-row INSERTs and refresh the bank."""
+    inserted = 0
+    chunk: List[Dict[str, Any]] = []
+    with Session(get_engine()) as db:
+        for item in items:
+            chunk.append(_to_row(item))
+            if len(chunk) >= chunk_size:
+                db.exec(insert(BossQuestion), params=chunk)
+                inserted += len(chunk)
+                chunk = []
+        if chunk:
+            db.exec(insert(BossQuestion), params=chunk)
+            inserted += len(chunk)
+        db.commit()
+    question_bank.load()
+    return inserted
+
+
+def _bank_is_empty() -> bool:
+    with Session(get_engine()) as db:
+        return db.exec(select(func.count(BossQuestion.id))).one() == 0
+
+
+def load_question_bank() -> None:
+    """Seed the built-in questions on first run, then load the bank into memory."""
+    if _bank_is_empty():
+        # Workers starting together would each seed a copy; the lease lets
+        # one of them do it and the others re-check once it is done. A worker
+        # still waiting after 30s loads whatever is there rather than seed.
+        with lease("seed-questions", seconds=60, wait=30) as held:
+            if held and _bank_is_empty():
+                import_questions(_DEFAULT_QUESTIONS)
+                return
+    question_bank.load()
+
+
+def _read_file(path: str) -> List[Dict[str, Any]]:
+    with open(path, newline="", encoding="utf-8") as fh:
+        if path.endswith(".csv"):
+            return list(csv.DictReader(fh))
+        return json.load(fh)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m app.question_bank <questions.json|questions.csv>")
+    init_db()
+    count = import_questions(_read_file(sys.argv[1]))
+    print(f"Imported {count} questions.")
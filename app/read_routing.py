@@ -0,0 +1,106 @@
+"""
+Routes read traffic to the read replicas (DATABASE_REPLICA_URLS).
+
+GET/HEAD/OPTIONS requests may read from a replica through `get_read_engine()`;
+everything else, and every handler that calls `get_engine()`, uses the
+primary. Replicas lag, so after a write the client reads from the primary
+for READ_YOUR_WRITES_SECONDS (default 5): the write's response sets a
+`read-primary-until` cookie and an `X-Read-Primary-Until` header (a Unix
+timestamp), and a read that carries either one, still in the future, stays
+on the primary. Clients without cookies echo the header back.
+
+A replica that fails mid-request (OperationalError: connection lost, file
+gone, ...) is marked down by the ReplicaSet, and the request is run again on
+the primary as long as no part of the response has been sent yet.
+
+Without replicas configured the middleware passes every request through.
+"""
+import os
+import time
+from http.cookies import SimpleCookie
+
+from sqlalchemy.exc import OperationalError
+
+from app.database import REPLICA_URLS, replica_reads
+
+
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+COOKIE_NAME = "read-primary-until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def _primary_until(scope) -> float:
+    headers = dict(scope["headers"])
+    values = []
+    if b"x-read-primary-until" in headers:
+        values.append(headers[b"x-read-primary-until"].decode("latin-1"))
+    if b"cookie" in headers:
+        cookie = SimpleCookie(headers[b"cookie"].decode("latin-1")).get(COOKIE_NAME)
+        if cookie is not None:
+            values.append(cookie.value)
+    until = 0.0
+    for value in values:
+        try:
+            until = max(until, float(value))
+        except ValueError:
+            pass
+    return until
+
+
+class ReadRoutingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REPLICA_URLS:
+            return await self.app(scope, receive, send)
+
+        if scope["method"] in SAFE_METHODS:
+            if _primary_until(scope) > time.time():
+                with replica_reads(False):
+                    return await self.app(scope, receive, send)
+            return await self._read(scope, receive, send)
+
+        until = str(int(time.time() + READ_YOUR_WRITES_SECONDS) + 1)
+
+        async def send_with_stickiness(message):
+            if message["type"] == "http.response.start":
+                cookie = f"{COOKIE_NAME}={until}; Max-Age={READ_YOUR_WRITES_SECONDS + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [
+                    *message.get("headers", []),
+                    (b"x-read-primary-until", until.encode()),
+                    (b"set-cookie", cookie.encode()),
+                ]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_stickiness)
+
+    async def _read(self, scope, receive, send):
+        """Serve from a replica; on a replica error, retry on the primary."""
+        received = []
+        started = False
+
+        async def recording_receive():
+            message = await receive()
+            received.append(message)
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            started = True
+            await send(message)
+
+        try:
+            with replica_reads(True):
+                return await self.app(scope, recording_receive, tracking_send)
+        except OperationalError:
+            if started:
+                raise
+
+        replay = iter(received)
+
+        async def replaying_receive():
+            return next(replay, None) or await receive()
+
+        with replica_reads(False):
+            await self.app(scope, replaying_receive, send)
@@ -0,0 +1,40 @@
+import hmac
+import os
+
+from fastapi import APIRouter, Header, HTTPException
+
+from app import slow_queries
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def _check_token(token: str | None) -> None:
+    """Deny by default: without ADMIN_TOKEN configured the admin routes are off."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+@router.get("/slow-queries")
+def list_slow_queries(limit: int = 20, x_admin_token: str | None = Header(default=None)):
+    """
+    Slow statements (over SLOW_QUERY_MS) grouped by fingerprint, most total
+    time first, each with an example, the routes that ran it and its EXPLAIN
+    plan (null until the background capture has finished).
+    """
+    _check_token(x_admin_token)
+    log = slow_queries.slow_query_log
+    if log is None:
+        return {"threshold_ms": None, "queries": []}
+    return {"threshold_ms": log.threshold_ms, "queries": log.top(limit)}
+
+
+@router.delete("/slow-queries", status_code=204)
+def reset_slow_queries(x_admin_token: str | None = Header(default=None)):
+    """Clear the aggregate, e.g. after adding an index."""
+    _check_token(x_admin_token)
+    if slow_queries.slow_query_log is not None:
+        slow_queries.slow_query_log.reset()
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
+
+router = APIRouter(tags=["Batch"])
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 20
+SAFE_METHODS = {"GET", "HEAD"}
+
+
+class SubRequest(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str  # may include a query string, e.g. "/progress/?user=walid"
+    body: Any = None
+    headers: Dict[str, str] = Field(default_factory=dict)
+
+
+class BatchRequest(BaseModel):
+    requests: List[SubRequest]
+
+
+# Outer-request headers a sub-request inherits unless it sets its own, so
+# read-your-writes stickiness (app.read_routing) carries into the batch.
+INHERITED_HEADERS = (b"cookie", b"x-read-primary-until")
+
+# ASGI connection keys copied from the outer request. Anything else the
+# framework added to its scope (route, endpoint, per-request exit stacks)
+# belongs to the outer request only.
+INHERITED_SCOPE_KEYS = (
+    "type", "asgi", "http_version", "scheme", "root_path", "app", "state", "server", "client",
+)
+
+
+async def _dispatch(parent: Request, sub: SubRequest, extra_headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Run one sub-request in-process (no sockets) through the app's full
+    middleware stack, so idempotency keys, metrics, profiling and read
+    routing apply to it exactly as to a direct call.
+
+    Sub-requests deliberately re-enter the middleware stack rather than
+    calling handlers directly with one shared DB session: the direct call
+    skipped idempotency replay, per-route metrics and read-your-writes
+    routing, and concurrent GETs run sync handlers on separate threadpool
+    threads, where a shared Session is not safe.
+    """
+    url = urlsplit(sub.path)
+    payload = json.dumps(sub.body).encode() if sub.body is not None else b""
+    own = {**(extra_headers or {}), **sub.headers}
+    headers = [(k.lower().encode(), v.encode()) for k, v in own.items()]
+    given = {name for name, _ in headers}
+    headers += [(k, v) for k, v in parent.scope["headers"] if k in INHERITED_HEADERS and k not in given]
+    if sub.body is not None:
+        headers.append((b"content-type", b"application/json"))
+    scope = {
+        **{k: parent.scope[k] for k in INHERITED_SCOPE_KEYS if k in parent.scope},
+        "method": sub.method.upper(),
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": headers,
+    }
+    status, chunks, response_headers = 500, [], {}
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update((k.decode(), v.decode()) for k, v in message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await parent.app.middleware_stack(scope, receive, send)
+        data = b"".join(chunks)
+        if "json" in response_headers.get("content-type", ""):
+            body = json.loads(data) if data else None
+        else:
+            body = data.decode("utf-8", errors="replace")
+    except Exception:
+        logger.exception("Batched request %s %s failed.", sub.method, sub.path)
+        return {"id": sub.id, "status": 500, "body": {"detail": "Internal Server Error"}}
+    result = {"id": sub.id, "status": status, "body": body}
+    if "x-read-primary-until" in response_headers:
+        result["read_primary_until"] = response_headers["x-read-primary-until"]
+    return result
+
+
+@router.post("/batch")
+async def batch(request: Request, data: BatchRequest):
+    """
+    Run several API calls in one round trip.
+    Sub-requests run in order; consecutive GETs run concurrently, and any
+    write waits for everything before it. Each result carries the
+    sub-request's `id`, HTTP `status` and decoded `body`.
+    """
+    if len(data.requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} requests per batch.")
+    if any(urlsplit(sub.path).path.rstrip("/") == "/batch" for sub in data.requests):
+        raise HTTPException(status_code=400, detail="Batches cannot be nested.")
+
+    responses: List[Dict[str, Any]] = []
+    reads: List[SubRequest] = []
+    sticky: Dict[str, str] = {}  # after a write, later reads stay on the primary
+    for sub in data.requests + [None]:
+        if sub is not None and sub.method.upper() in SAFE_METHODS:
+            reads.append(sub)
+            continue
+        if reads:
+            responses += await asyncio.gather(*(_dispatch(request, r, sticky) for r in reads))
+            reads = []
+        if sub is not None:
+            result = await _dispatch(request, sub, sticky)
+            until = result.pop("read_primary_until", None)
+            if until:
+                sticky = {"x-read-primary-until": until}
+            responses.append(result)
+    for result in responses:
+        result.pop("read_primary_until", None)
+    return {"responses": responses}
@@ -1,56 +1,32 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from sqlmodel import Session, select
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+import asyncio
+import json
+import logging
 
-from app.database import engine
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from sqlmodel import Session, select
+from datetime import date, datetime, timedelta
+from typing import Optional, List, Dict, Any, Tuple
+
+from app.activity import record_activity
+from app.battle_reaper import BattleReaper
+from app.battle_store import BattleState, battle_lock, battle_store
+from app.boss_leaderboard import boss_leaderboard
+from app.database import get_engine
 from app.models import BossBattle, User
+from app.question_bank import question_bank
+from app.xp import grant_xp
 
 
 router = APIRouter(prefix="/boss", tags=["Boss Battle"])
-
-
-_ACTIVE_SESSIONS: Dict[str, Dict[str, Any]] = {}
-
-
-_QUESTIONS = [
-    {
-        "question": "What is the time complexity of binary search?",
-        "choices": ["O(n)", "O(log n)", "O(n log n)", "O(1)"],
-        "answer_idx": 1,
-    },
-    {
-        "question": "Which HTTP method is idempotent?",
-        "choices": ["POST", "PUT", "PATCH", "CONNECT"],
-        "answer_idx": 1,
-    },
-    {
-        "question": "What does SQL stand for?",
-        "choices": [
-            "Simple Query Language",
-            "Structured Query Language",
-            "Sequential Query Language",
-            "System Query Language",
-        ],
-        "answer_idx": 1,
-    },
-    {
-        "question": "Which data structure uses FIFO order?",
-        "choices": ["Stack", "Queue", "Tree", "Heap"],
-        "answer_idx": 1,
-    },
-    {
-        "question": "Which status code means 'Not Found'?",
-        "choices": ["200", "301", "404", "500"],
-        "answer_idx": 2,
-    },
-]
+logger = logging.getLogger(__name__)
 
 
 class StartRequest(BaseModel):
     user: str
     difficulty: Optional[str] = "medium"  # easy | medium | hard
+    topic: Optional[str] = None
     total_questions: Optional[int] = 5
     time_limit_seconds: Optional[int] = 180  # timer per session
 
@@ -61,63 +37,139 @@ class AnswerRequest(BaseModel):
 
 
 def _ensure_user_exists(username: str) -> None:
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         user = session.exec(select(User).where(User.username == username)).first()
         if not user:
             raise HTTPException(status_code=404, detail="User not found. Please register first.")
 
 
-def _get_session(user: str) -> Dict[str, Any]:
-    sess = _ACTIVE_SESSIONS.get(user)
+def _get_session(user: str) -> BattleState:
+    sess = battle_store.get(user)
     if not sess:
         raise HTTPException(status_code=404, detail="No active boss battle. Start one first.")
     return sess
 
 
-def _time_remaining(sess: Dict[str, Any]) -> int:
+def _time_remaining(sess: BattleState) -> int:
     now = datetime.utcnow()
-    elapsed = (now - sess["started_at"]).total_seconds()
-    remaining = max(0, int(sess["time_limit_seconds"] - elapsed))
+    elapsed = (now - sess.started_at).total_seconds()
+    remaining = max(0, int(sess.time_limit_seconds - elapsed))
     return remaining
 
 
-def _end_session(user: str, status: str) -> Dict[str, Any]:
-    sess = _ACTIVE_SESSIONS.get(user)
-    if not sess:
-       
-        return {"message": "Session closed."}
-
-    xp_reward = sess["score"] * 20
+def _question(question_id: int) -> Dict[str, Any]:
+    q = question_bank.get(question_id)
+    if q is None:
+        raise HTTPException(
+            status_code=410,
+            detail="This question was removed from the bank. Forfeit and start a new battle.",
+        )
+    return q
 
-    with Session(engine) as db:
-        user_obj = db.exec(select(User).where(User.username == user)).first()
-        if user_obj:
-            user_obj.total_xp = (user_obj.total_xp or 0) + xp_reward
 
-        record = BossBattle(
-            user=user,
-            date=datetime.utcnow(),
-            score=sess["score"],
-            total_questions=sess["total_questions"],
-            xp_reward=xp_reward,
-            difficulty=sess["difficulty"],
-            completed=True,
+def _save_session(user: str, sess: BattleState) -> None:
+    if not battle_store.save(user, sess):
+        raise HTTPException(
+            status_code=409,
+            detail="Boss battle was updated by another request. Fetch the current question and retry.",
         )
-        db.add(record)
-        db.add(user_obj) if user_obj else None
+
+
+def _record_battles(ended: Dict[str, BattleState], now: datetime) -> None:
+    """Write the BossBattle rows, XP and activity of finished battles in one transaction."""
+    with Session(get_engine()) as db:
+        for user, sess in ended.items():
+            xp_reward = sess.score * 20
+            battle = BossBattle(
+                user=user,
+                date=now,
+                score=sess.score,
+                total_questions=sess.total_questions,
+                xp_reward=xp_reward,
+                difficulty=sess.difficulty.lower(),
+                completed=True,
+            )
+            db.add(battle)
+            db.flush()
+            grant_xp(db, user, xp_reward, "boss", battle.id)
+            record_activity(db, user, "boss", {
+                "score": sess.score,
+                "total_questions": sess.total_questions,
+                "difficulty": sess.difficulty,
+                "xp_reward": xp_reward,
+            })
         db.commit()
-        db.refresh(record)
-
-    result = {
-        "status": status,
-        "score": sess["score"],
-        "xp_reward": xp_reward,
-        "total_questions": sess["total_questions"],
-        "lives_remaining": sess["lives"],
-        "ended": True,
-    }
-    _ACTIVE_SESSIONS.pop(user, None)
-    return result
+
+
+def _end_sessions(items: List[Tuple[str, str, Optional[BattleState]]]) -> List[Dict[str, Any]]:
+    """
+    Finalize several battles in one DB transaction.
+    `items` are `(user, status, sess)` tuples; results come back in the same order.
+    """
+    # Claiming the session via pop() guarantees XP is awarded exactly once,
+    # even if several workers (or the reaper) notice the end at the same time.
+    claimed = []
+    for user, status, sess in items:
+        with battle_lock(user):
+            claimed.append(battle_store.pop(user, version=sess.version if sess else None))
+
+    ended = {user: sess for (user, _, _), sess in zip(items, claimed) if sess}
+    now = datetime.utcnow()
+    if ended:
+        try:
+            _record_battles(ended, now)
+        except Exception:
+            # Nothing was written: put the claimed sessions back so the battle
+            # and its XP are finalized by the next request or reaper pass.
+            # The restore can fail for the same reason (database-backed store);
+            # log that and surface the original error.
+            for user, sess in ended.items():
+                try:
+                    with battle_lock(user):
+                        battle_store.create(user, sess)
+                except Exception:
+                    logger.exception("Could not restore the boss battle session of %s.", user)
+            raise
+        for user, sess in ended.items():
+            boss_leaderboard.record(user, now, sess.difficulty, sess.score)
+
+    results = []
+    for (user, status, _), sess in zip(items, claimed):
+        if not sess:
+            results.append({"message": "Session closed."})
+            continue
+        results.append({
+            "status": status,
+            "score": sess.score,
+            "xp_reward": sess.score * 20,
+            "total_questions": sess.total_questions,
+            "lives_remaining": sess.lives,
+            "ended": True,
+        })
+    return results
+
+
+def _end_session(user: str, status: str, sess: Optional[BattleState] = None) -> Dict[str, Any]:
+    return _end_sessions([(user, status, sess)])[0]
+
+
+def _reap_expired(candidates: List[Tuple[str, datetime]]) -> int:
+    """Finalize the candidates whose battle is still live and out of time."""
+    items = []
+    for user, expires_at in candidates:
+        with battle_lock(user):
+            sess = battle_store.get(user)
+        # Skip battles that already ended or were restarted since scheduling.
+        # pop() re-checks the version, so an answer racing in between wins.
+        if sess and sess.expires_at == expires_at and _time_remaining(sess) == 0:
+            items.append((user, "timeout", sess))
+    if not items:
+        return 0
+    return sum(1 for r in _end_sessions(items) if r.get("ended"))
+
+
+reaper = BattleReaper(battle_store, _reap_expired)
+
 
 @router.get("/")
 def info():
@@ -129,6 +181,10 @@ def info():
             "answer": "POST /boss/answer",
             "status": "GET /boss/status?user=<username>",
             "forfeit": "POST /boss/forfeit?user=<username>",
+            "leaderboard": "GET /boss/leaderboard?date=<YYYY-MM-DD>&difficulty=<level>",
+            "my rank": "GET /boss/leaderboard/rank?user=<username>",
+            "stats": "GET /boss/stats",
+            "realtime": "WS /boss/ws?user=<username>&difficulty=<level>",
         },
     }
 
@@ -138,30 +194,33 @@ def start_boss_battle(payload: StartRequest):
     """
     Start a new boss battle session.
     - Initializes timer, 3 lives, score 0
-    - Limits questions to `total_questions` from the bank
-    - Difficulty is informational for now
+    - Draws `total_questions` random questions from the bank,
+      filtered by `difficulty` (and `topic` when given)
     """
     _ensure_user_exists(payload.user)
 
     if payload.total_questions < 1:
         raise HTTPException(status_code=400, detail="total_questions must be >= 1")
 
-    if payload.user in _ACTIVE_SESSIONS:
+    question_bank.ensure_fresh()
+    question_ids = question_bank.sample(payload.total_questions, payload.difficulty, payload.topic)
+    if not question_ids:
+        raise HTTPException(status_code=404, detail="No questions available for this topic.")
+
+    total = len(question_ids)
+    started_at = datetime.utcnow()
+    created = battle_store.create(payload.user, BattleState(
+        difficulty=(payload.difficulty or "medium").lower(),
+        started_at=started_at,
+        time_limit_seconds=payload.time_limit_seconds or 180,
+        total_questions=total,
+        question_ids=question_ids,
+    ))
+    if not created:
         raise HTTPException(status_code=409, detail="An active boss battle already exists.")
+    reaper.schedule(payload.user, started_at, payload.time_limit_seconds or 180)
 
-    total = min(payload.total_questions, len(_QUESTIONS))
-    _ACTIVE_SESSIONS[payload.user] = {
-        "difficulty": payload.difficulty or "medium",
-        "started_at": datetime.utcnow(),
-        "time_limit_seconds": payload.time_limit_seconds or 180,
-        "lives": 3,
-        "score": 0,
-        "index": 0,
-        "total_questions": total,
-        "questions": _QUESTIONS[:total],
-    }
-
-    q = _QUESTIONS[0]
+    q = _question(question_ids[0])
     return {
         "message": "Boss battle started.",
         "user": payload.user,
@@ -178,96 +237,220 @@ def start_boss_battle(payload: StartRequest):
 
 @router.get("/question")
 def get_current_question(user: str):
-    sess = _get_session(user)
+    with battle_lock(user):
+        sess = _get_session(user)
 
-    if _time_remaining(sess) == 0:
-        return _end_session(user, status="timeout")
-    if sess["lives"] <= 0:
-        return _end_session(user, status="out_of_lives")
+        if _time_remaining(sess) == 0:
+            return _end_session(user, sess=sess, status="timeout")
+        if sess.lives <= 0:
+            return _end_session(user, sess=sess, status="out_of_lives")
 
-    idx = sess["index"]
-    if idx >= sess["total_questions"]:
-        return _end_session(user, status="completed")
+        idx = sess.index
+        if idx >= sess.total_questions:
+            return _end_session(user, sess=sess, status="completed")
 
-    q = sess["questions"][idx]
-    return {
-        "question": q["question"],
-        "choices": q["choices"],
-        "number": idx + 1,
-        "total": sess["total_questions"],
-        "lives": sess["lives"],
-        "timer_remaining": _time_remaining(sess),
-        "score": sess["score"],
-    }
+        q = _question(sess.question_ids[idx])
+        return {
+            "question": q["question"],
+            "choices": q["choices"],
+            "number": idx + 1,
+            "total": sess.total_questions,
+            "lives": sess.lives,
+            "timer_remaining": _time_remaining(sess),
+            "score": sess.score,
+        }
 
 
 @router.post("/answer")
 def submit_answer(payload: AnswerRequest):
-    sess = _get_session(payload.user)
-
-
-    if _time_remaining(sess) == 0:
-        return _end_session(payload.user, status="timeout")
-
-    idx = sess["index"]
-    if idx >= sess["total_questions"]:
-        return _end_session(payload.user, status="completed")
-
-    q = sess["questions"][idx]
-    correct_idx = q["answer_idx"]
-    is_correct = payload.choice_idx == correct_idx
-
-    if is_correct:
-        sess["score"] += 1
-        feedback = "Correct! +20 XP"
-    else:
-        sess["lives"] -= 1
-        feedback = "Wrong! -1 life"
-
-    sess["index"] += 1
-
-    if sess["lives"] <= 0:
-        return _end_session(payload.user, status="out_of_lives")
-
-    if sess["index"] >= sess["total_questions"]:
-        return _end_session(payload.user, status="completed")
-
-    next_q = sess["questions"][sess["index"]]
-    return {
-        "correct": is_correct,
-        "feedback": feedback,
-        "lives": sess["lives"],
-        "score": sess["score"],
-        "timer_remaining": _time_remaining(sess),
-        "next_question": {
-            "number": sess["index"] + 1,
-            "total": sess["total_questions"],
-            "question": next_q["question"],
-            "choices": next_q["choices"],
-        },
-    }
+    with battle_lock(payload.user):
+        sess = _get_session(payload.user)
+
+        if _time_remaining(sess) == 0:
+            return _end_session(payload.user, sess=sess, status="timeout")
+
+        idx = sess.index
+        if idx >= sess.total_questions:
+            return _end_session(payload.user, sess=sess, status="completed")
+
+        q = _question(sess.question_ids[idx])
+        correct_idx = q["answer_idx"]
+        is_correct = payload.choice_idx == correct_idx
+
+        if is_correct:
+            sess.score += 1
+            feedback = "Correct! +20 XP"
+        else:
+            sess.lives -= 1
+            feedback = "Wrong! -1 life"
+
+        sess.index += 1
+        _save_session(payload.user, sess)
+
+        if sess.lives <= 0:
+            return _end_session(payload.user, sess=sess, status="out_of_lives")
+
+        if sess.index >= sess.total_questions:
+            return _end_session(payload.user, sess=sess, status="completed")
+
+        next_q = _question(sess.question_ids[sess.index])
+        return {
+            "correct": is_correct,
+            "feedback": feedback,
+            "lives": sess.lives,
+            "score": sess.score,
+            "timer_remaining": _time_remaining(sess),
+            "next_question": {
+                "number": sess.index + 1,
+                "total": sess.total_questions,
+                "question": next_q["question"],
+                "choices": next_q["choices"],
+            },
+        }
 
 
 @router.get("/status")
 def get_status(user: str):
-    sess = _get_session(user)
-    remaining = _time_remaining(sess)
-    if remaining == 0:
-        return _end_session(user, status="timeout")
-    status = {
-        "lives": sess["lives"],
-        "score": sess["score"],
-        "question_number": min(sess["index"] + 1, sess["total_questions"]),
-        "total_questions": sess["total_questions"],
-        "timer_remaining": remaining,
-        "completed": False,
-    }
-    return status
+    with battle_lock(user):
+        sess = _get_session(user)
+        remaining = _time_remaining(sess)
+        if remaining == 0:
+            return _end_session(user, sess=sess, status="timeout")
+        status = {
+            "lives": sess.lives,
+            "score": sess.score,
+            "question_number": min(sess.index + 1, sess.total_questions),
+            "total_questions": sess.total_questions,
+            "timer_remaining": remaining,
+            "completed": False,
+        }
+        return status
 
 
 @router.post("/forfeit")
 def forfeit(user: str):
-    _ = _get_session(user)
-    return _end_session(user, status="forfeit")
+    with battle_lock(user):
+        sess = _get_session(user)
+        return _end_session(user, sess=sess, status="forfeit")
+
+
+@router.get("/leaderboard")
+def get_daily_leaderboard(
+    day: Optional[date] = Query(None, alias="date"),
+    difficulty: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Best boss battle score per user for one day (default: today, UTC).
+    Optionally restricted to one difficulty.
+    """
+    day = day or datetime.utcnow().date()
+    difficulty = difficulty.lower() if difficulty else None
+    return {
+        "date": day.isoformat(),
+        "difficulty": difficulty,
+        "entries": boss_leaderboard.top(day, difficulty, limit, offset),
+    }
+
 
+@router.get("/leaderboard/rank")
+def get_my_daily_rank(
+    user: str,
+    day: Optional[date] = Query(None, alias="date"),
+    difficulty: Optional[str] = None,
+):
+    """A single user's rank on the daily board."""
+    day = day or datetime.utcnow().date()
+    difficulty = difficulty.lower() if difficulty else None
+    entry, participants = boss_leaderboard.rank(user, day, difficulty)
+    if not entry:
+        raise HTTPException(status_code=404, detail="No boss battle recorded for this user on that day.")
+    return {"date": day.isoformat(), "difficulty": difficulty, "participants": participants, **entry}
+
+
+@router.get("/stats")
+def reaper_stats():
+    """Live battle count and how far behind the expiry sweeper is running."""
+    return reaper.stats()
+
+
+@router.websocket("/ws")
+async def boss_battle_ws(
+    websocket: WebSocket,
+    user: str,
+    difficulty: str = "medium",
+    topic: Optional[str] = None,
+    total_questions: int = 5,
+    time_limit_seconds: int = 180,
+):
+    """
+    Run a whole boss battle over one connection.
 
+    Server → client: `started` (with the first question), `answer` (with the
+    next question), `tick` once per second, then `ended` or `error`.
+    Client → server: `{"choice_idx": n}` or `{"action": "forfeit"}`.
+    """
+    await websocket.accept()
+    try:
+        started = await run_in_threadpool(start_boss_battle, StartRequest(
+            user=user,
+            difficulty=difficulty,
+            topic=topic,
+            total_questions=total_questions,
+            time_limit_seconds=time_limit_seconds,
+        ))
+    except HTTPException as exc:
+        await websocket.send_json({"type": "error", "status": exc.status_code, "detail": exc.detail})
+        await websocket.close(code=1008)
+        return
+
+    deadline = datetime.utcnow() + timedelta(seconds=started["timer_seconds"])
+    lives, score = started["lives"], 0
+    await websocket.send_json({"type": "started", **started})
+
+    try:
+        while True:
+            remaining = max(0, int((deadline - datetime.utcnow()).total_seconds()))
+            if remaining == 0:
+                result = await run_in_threadpool(_end_session, user, "timeout")
+                await websocket.send_json({"type": "ended", **result})
+                break
+
+            try:
+                message = await asyncio.wait_for(websocket.receive_json(), timeout=min(1.0, remaining))
+            except asyncio.TimeoutError:
+                await websocket.send_json({"type": "tick", "timer_remaining": remaining, "lives": lives, "score": score})
+                continue
+            except (json.JSONDecodeError, KeyError):  # not JSON, or a binary frame (no "text")
+                await websocket.send_json({"type": "error", "status": 400, "detail": "Expected a JSON object."})
+                continue
+
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "status": 400, "detail": "Expected a JSON object."})
+                continue
+            try:
+                if message.get("action") == "forfeit":
+                    result = await run_in_threadpool(forfeit, user)
+                else:
+                    answer = AnswerRequest(user=user, choice_idx=message.get("choice_idx", -1))
+                    result = await run_in_threadpool(submit_answer, answer)
+            except ValidationError:
+                await websocket.send_json({"type": "error", "status": 422, "detail": "choice_idx must be an integer."})
+                continue
+            except HTTPException as exc:
+                await websocket.send_json({"type": "error", "status": exc.status_code, "detail": exc.detail})
+                if exc.status_code == 404:
+                    break
+                continue
+
+            if result.get("ended") or "message" in result:
+                await websocket.send_json({"type": "ended", **result})
+                break
+            lives, score = result["lives"], result["score"]
+            await websocket.send_json({"type": "answer", **result})
+    except WebSocketDisconnect:
+        # The session stays live; the client can resume over HTTP or the
+        # reaper finalizes it at its deadline.
+        return
+    await websocket.close()
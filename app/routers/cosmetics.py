@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from sqlmodel import Session, select
-from app.database import engine
+from app.cache import cached
+from app.database import get_engine, get_read_engine
 from app.models import Avatar, Badge, User
 from app.schemas import AvatarCreate, AvatarRead, BadgeCreate, BadgeRead
 
@@ -19,7 +20,7 @@ def _ensure_user(session: Session, username: str) -> None:
 @router.post("/avatar", response_model=AvatarRead)
 def create_avatar(data: AvatarCreate):
     """Create or update the user's avatar."""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         _ensure_user(session, data.user)
         # Check if user already has an avatar
         existing = session.exec(select(Avatar).where(Avatar.user == data.user)).first()
@@ -41,9 +42,10 @@ def create_avatar(data: AvatarCreate):
 
 
 @router.get("/avatar/{username}", response_model=AvatarRead)
+@cached("avatar", scope="username")
 def get_avatar(username: str):
     """Retrieve avatar details for a specific user."""
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         _ensure_user(session, username)
         avatar = session.exec(select(Avatar).where(Avatar.user == username)).first()
         if not avatar:
@@ -58,7 +60,7 @@ def get_avatar(username: str):
 @router.post("/badge", response_model=BadgeRead)
 def create_badge(data: BadgeCreate):
     """Create a new badge (admin use)."""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         badge = Badge(**data.dict())
         session.add(badge)
         session.commit()
@@ -67,9 +69,10 @@ def create_badge(data: BadgeCreate):
 
 
 @router.get("/badges", response_model=list[BadgeRead])
+@cached("badge")
 def list_badges():
     """List all available badges."""
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         badges = session.exec(select(Badge)).all()
         return badges
 
@@ -77,6 +80,6 @@ def list_badges():
 @router.get("/badges/{xp}", response_model=list[BadgeRead])
 def get_unlockable_badges(xp: int):
     """List all badges unlockable given the user's total XP."""
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         badges = session.exec(select(Badge).where(Badge.xp_required <= xp)).all()
         return badges
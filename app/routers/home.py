@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from sqlmodel import Session, select
 from datetime import datetime
-from app.database import engine
+from app.database import get_read_engine
 from app.models import Progress, User
 
 
@@ -73,7 +73,7 @@ def get_dashboard(user: str):
     - Motivational message
     - Quick links to other pages
     """
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         # 1️⃣ Fetch the user if exists
         user_obj = session.exec(select(User).where(User.username == user)).first()
         if not user_obj:
@@ -96,7 +96,7 @@ def get_dashboard(user: str):
 
         # 3️⃣ Sort and calculate stats
         sessions.sort(key=lambda x: x.date, reverse=True)
-        total_xp = user_obj.total_xp or sum(s.xp_gained for s in sessions)
+        total_xp = user_obj.total_xp  # maintained by app.xp.grant_xp
         total_sessions = len(sessions)
         streak = calculate_streak(sessions)
         motivation = get_motivation_message(streak)
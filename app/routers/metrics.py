@@ -0,0 +1,43 @@
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+
+from app.cache import query_cache
+from app.database import get_replicas
+from app.metrics import registry
+from app.routers.bossbattle import reaper
+
+router = APIRouter(tags=["Metrics"])
+
+
+def _gauge(name: str, help_text: str, samples) -> list:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    return lines + [f"{name}{labels} {value}" for labels, value in samples]
+
+
+def _counter(name: str, help_text: str, samples) -> list:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    return lines + [f"{name}{labels} {value}" for labels, value in samples]
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint: request latency, SQL counters, cache, reaper and replica stats."""
+    cache = query_cache.stats()
+    boss = await run_in_threadpool(reaper.stats)
+    replicas = get_replicas()
+    extra = (
+        _counter("studyquest_cache_hits_total", "Read-cache hits by handler.",
+                 [(f'{{handler="{name}"}}', n) for name, n in sorted(cache["hits"].items())])
+        + _counter("studyquest_cache_misses_total", "Read-cache misses by handler.",
+                   [(f'{{handler="{name}"}}', n) for name, n in sorted(cache["misses"].items())])
+        + _gauge("studyquest_cache_entries", "Entries in the read cache.", [("", cache["entries"])])
+        + _gauge("studyquest_boss_active_sessions", "Live boss battles.", [("", boss["active_sessions"])])
+        + _counter("studyquest_boss_reaped_total", "Expired boss battles finalized by the reaper.",
+                   [("", boss["reaped_total"])])
+        + _gauge("studyquest_boss_reap_lag_seconds", "Delay between a battle's deadline and its reaping.",
+                 [('{stat="last"}', boss["last_reap_lag_seconds"]), ('{stat="max"}', boss["max_reap_lag_seconds"])])
+        + _gauge("studyquest_db_replica_up", "1 if the read replica is in rotation.",
+                 [(f'{{replica="{i}"}}', int(up)) for i, up in (replicas.stats() if replicas else [])])
+    )
+    return registry.render(extra)
@@ -2,9 +2,11 @@ from fastapi import APIRouter, HTTPException
 from sqlmodel import Session, select
 from datetime import datetime, timedelta
 
-from app.database import engine
+from app.activity import record_activity
+from app.database import get_engine, get_read_engine
 from app.models import Progress, User
 from app.schemas import ProgressCreate
+from app.xp import grant_xp
 
 router = APIRouter(prefix="/progress", tags=["Progress Tracking"])
 
@@ -41,7 +43,7 @@ def calculate_streak(latest_session_date: datetime, all_sessions: list[Progress]
 @router.get("/")
 def list_progress(user: str):
     """Return all progress sessions for a specific user."""
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         _ensure_user_exists(session, user)
         progress = session.exec(select(Progress).where(Progress.user == user)).all()
         if not progress:
@@ -56,7 +58,7 @@ def add_progress(data: ProgressCreate):
     - Calculates XP based on duration.
     - Computes user's current streak.
     """
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         _ensure_user_exists(session, data.user)
         xp = calculate_xp(data.duration_minutes)
         new_entry = Progress(
@@ -68,6 +70,12 @@ def add_progress(data: ProgressCreate):
         )
 
         session.add(new_entry)
+        session.flush()
+        grant_xp(session, data.user, xp, "progress", new_entry.id)
+        record_activity(session, data.user, "progress", {
+            "duration_minutes": data.duration_minutes,
+            "xp_gained": xp,
+        })
         session.commit()
         session.refresh(new_entry)
 
@@ -91,7 +99,7 @@ def get_statistics(user: str):
     - Average session duration
     - Current streak
     """
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         _ensure_user_exists(session, user)
         sessions = session.exec(select(Progress).where(Progress.user == user)).all()
 
@@ -116,10 +124,11 @@ def get_statistics(user: str):
 @router.delete("/{progress_id}")
 def delete_progress(progress_id: int):
     """Allow user to delete a progress entry."""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         progress = session.get(Progress, progress_id)
         if not progress:
             raise HTTPException(status_code=404, detail="Progress entry not found.")
+        grant_xp(session, progress.user, -progress.xp_gained, "progress", progress.id)
         session.delete(progress)
         session.commit()
         return {"message": f"Progress entry {progress_id} deleted successfully."}
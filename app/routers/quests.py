@@ -1,9 +1,12 @@
 from fastapi import APIRouter, HTTPException
 from sqlmodel import Session, select
 from datetime import datetime
-from app.database import engine
-from app.models import Quest, Level
+from app.activity import record_activity
+from app.cache import cached
+from app.database import get_engine, get_read_engine
+from app.models import Quest, User
 from app.schemas import QuestCreate, QuestRead, LevelRead
+from app.xp import grant_xp, level_progress
 
 router = APIRouter(prefix="/quests", tags=["Quests & Levels"])
 
@@ -15,7 +18,7 @@ router = APIRouter(prefix="/quests", tags=["Quests & Levels"])
 @router.post("/", response_model=QuestRead)
 def create_quest(data: QuestCreate):
     """Create a new quest (admin or team use)."""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         quest = Quest(**data.dict())
         session.add(quest)
         session.commit()
@@ -26,7 +29,7 @@ def create_quest(data: QuestCreate):
 @router.get("/", response_model=list[QuestRead])
 def list_quests(user: str = None):
     """List all quests (or user-specific if ?user=username is provided)."""
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         if user:
             quests = session.exec(select(Quest).where(Quest.assigned_to == user)).all()
         else:
@@ -37,7 +40,7 @@ def list_quests(user: str = None):
 @router.put("/{quest_id}/complete", response_model=QuestRead)
 def complete_quest(quest_id: int):
     """Mark a quest as completed and reward XP."""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         quest = session.get(Quest, quest_id)
         if not quest:
             raise HTTPException(status_code=404, detail="Quest not found.")
@@ -47,20 +50,14 @@ def complete_quest(quest_id: int):
         quest.completed = True
         session.add(quest)
 
-        # Update user's XP level
-        level = session.exec(select(Level).where(Level.user == quest.assigned_to)).first()
-        if not level:
-            level = Level(user=quest.assigned_to, total_xp=quest.xp_reward)
-            session.add(level)
-        else:
-            level.total_xp += quest.xp_reward
-
-            # Handle level-up logic
-            if level.total_xp >= level.xp_to_next:
-                level.current_level += 1
-                level.total_xp -= level.xp_to_next
-                level.xp_to_next += 50  # progressively harder
-
+        # Reward XP (the user's level is derived from their XP total)
+        if quest.assigned_to:
+            grant_xp(session, quest.assigned_to, quest.xp_reward, "quest", quest.id)
+            record_activity(session, quest.assigned_to, "quest", {
+                "quest_id": quest.id,
+                "name": quest.name,
+                "xp_reward": quest.xp_reward,
+            })
         session.commit()
         session.refresh(quest)
         return quest
@@ -71,10 +68,21 @@ def complete_quest(quest_id: int):
 # ------------------------------------------------------------------
 
 @router.get("/level/{username}", response_model=LevelRead)
+@cached("user", scope="username")
 def get_user_level(username: str):
-    """Get the user's level and XP stats."""
-    with Session(engine) as session:
-        level = session.exec(select(Level).where(Level.user == username)).first()
-        if not level:
+    """
+    Get the user's level and XP stats, derived from their XP total.
+    `total_xp` is the XP earned within the current level.
+    """
+    with Session(get_read_engine()) as session:
+        user = session.exec(select(User).where(User.username == username)).first()
+        if not user:
             raise HTTPException(status_code=404, detail="No level data found for this user.")
-        return level
+        current_level, xp_into_level, xp_to_next = level_progress(user.total_xp)
+        return LevelRead(
+            id=user.id,
+            user=username,
+            current_level=current_level,
+            total_xp=xp_into_level,
+            xp_to_next=xp_to_next,
+        )
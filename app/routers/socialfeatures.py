@@ -1,11 +1,19 @@
 from fastapi import APIRouter, HTTPException, Query
-from sqlmodel import Session, select
+from sqlalchemy import literal, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, func, select
+import json
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Tuple
 
-from app.database import engine
+from app.activity import forget_friendship, read_feed
+from app.cache import cached
+from app.database import get_engine, get_read_engine
+from app.leaderboard_snapshot import latest_period_start, streaks_query
 from app.models import User, Friend, Leaderboard
-from app.schemas import FriendCreate, FriendRead, LeaderboardRead
+from app.schemas import FriendCreate, FriendRead, LeaderboardEntry
+from app.xp_ranking import xp_ranking
 
 router = APIRouter(prefix="/social", tags=["Social Features"])
 
@@ -21,6 +29,33 @@ def get_user(session: Session, username: str) -> User:
     return user
 
 
+def canonical_pair(a: str, b: str) -> Tuple[str, str]:
+    """Friendships are stored once, as (lower username, higher username)."""
+    return (a, b) if a < b else (b, a)
+
+
+def find_friendship(session: Session, a: str, b: str) -> Optional[Friend]:
+    """Look up the friendship between two users with one unique-index probe."""
+    low, high = canonical_pair(a, b)
+    return session.exec(
+        select(Friend).where(Friend.user == low, Friend.friend_username == high)
+    ).first()
+
+
+def as_friend_read(friendship: Friend) -> FriendRead:
+    """Present a canonical row from the requester's side, as the API always has."""
+    requester = friendship.requester or friendship.user
+    other = friendship.friend_username if requester == friendship.user else friendship.user
+    return FriendRead(
+        id=friendship.id,
+        user=requester,
+        friend_username=other,
+        since=friendship.since,
+        status=friendship.status,
+        requester=requester,
+    )
+
+
 # ------------------------------------------------------------------
 # 🔹 Friend System
 # ------------------------------------------------------------------
@@ -31,31 +66,33 @@ def add_friend(request: FriendCreate):
     Send a friend request from one user to another.
     If accepted immediately, status will be 'accepted'.
     """
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
+        if request.user == request.friend_username:
+            raise HTTPException(status_code=400, detail="You cannot add yourself as a friend.")
         sender = get_user(session, request.user)
         receiver = get_user(session, request.friend_username)
 
         # Check if friendship already exists
-        existing = session.exec(
-            select(Friend).where(
-                ((Friend.user == request.user) & (Friend.friend_username == request.friend_username))
-                | ((Friend.user == request.friend_username) & (Friend.friend_username == request.user))
-            )
-        ).first()
-
-        if existing:
+        if find_friendship(session, request.user, request.friend_username):
             raise HTTPException(status_code=400, detail="Friendship already exists or pending.")
 
+        low, high = canonical_pair(request.user, request.friend_username)
         friendship = Friend(
-            user=request.user,
-            friend_username=request.friend_username,
+            user=low,
+            friend_username=high,
+            requester=request.user,
             status="pending",
             since=datetime.utcnow()
         )
         session.add(friendship)
-        session.commit()
+        try:
+            session.commit()
+        except IntegrityError:
+            # A concurrent request for the same pair won the unique index.
+            session.rollback()
+            raise HTTPException(status_code=400, detail="Friendship already exists or pending.")
         session.refresh(friendship)
-        return friendship
+        return as_friend_read(friendship)
 
 
 @router.patch("/friends/respond", response_model=FriendRead)
@@ -68,14 +105,11 @@ def respond_to_request(
     Respond to a friend request.
     Actions: 'accept', 'decline', 'block'
     """
-    with Session(engine) as session:
-        request_obj = session.exec(
-            select(Friend).where(
-                (Friend.user == friend_username) & (Friend.friend_username == user)
-            )
-        ).first()
+    with Session(get_engine()) as session:
+        request_obj = find_friendship(session, user, friend_username)
 
-        if not request_obj:
+        # Only the receiver of a request can respond to it.
+        if not request_obj or (request_obj.requester or request_obj.user) != friend_username:
             raise HTTPException(status_code=404, detail="Friend request not found.")
 
         if action == "accept":
@@ -87,27 +121,79 @@ def respond_to_request(
             return {"message": "Friend request declined and removed."}
         elif action == "block":
             request_obj.status = "blocked"
+            forget_friendship(session, user, friend_username)
 
         session.add(request_obj)
         session.commit()
         session.refresh(request_obj)
-        return request_obj
+        return as_friend_read(request_obj)
 
 
 @router.get("/friends/list", response_model=List[FriendRead])
+@cached("friend", scope="user")
 def list_friends(user: str):
     """
     List all accepted friends for a given user.
+    Two index probes, on (user, status) and (friend_username, status),
+    instead of an OR that neither index can serve.
+    """
+    both_sides = union_all(
+        select(Friend).where(Friend.user == user, Friend.status == "accepted"),
+        select(Friend).where(Friend.friend_username == user, Friend.status == "accepted"),
+    ).subquery()
+    with Session(get_read_engine()) as session:
+        get_user(session, user)  # validate existence
+        results = session.exec(select(aliased(Friend, both_sides))).all()
+        return [as_friend_read(friendship) for friendship in results]
+
+
+@router.get("/friends/suggestions")
+def suggest_friends(user: str, limit: int = Query(10, ge=1, le=50)):
     """
-    with Session(engine) as session:
+    Suggest people the user is not connected to yet, ranked by mutual friends.
+    Only accepted friendships are traversed, and anyone with a pending,
+    blocked or accepted relationship with the user is left out.
+    """
+    def neighbours_of(name: str):
+        return union_all(
+            select(Friend.friend_username.label("username"))
+            .where(Friend.user == name, Friend.status == "accepted"),
+            select(Friend.user.label("username"))
+            .where(Friend.friend_username == name, Friend.status == "accepted"),
+        )
+
+    friends = neighbours_of(user).cte("friends")
+    related = union_all(
+        select(Friend.friend_username).where(Friend.user == user),
+        select(Friend.user).where(Friend.friend_username == user),
+    )
+    # Friends-of-friends: each accepted edge touching one of my friends,
+    # read through the (user, status) and (friend_username, status) indexes.
+    second_degree = union_all(
+        select(Friend.friend_username.label("candidate"))
+        .join(friends, Friend.user == friends.c.username)
+        .where(Friend.status == "accepted"),
+        select(Friend.user.label("candidate"))
+        .join(friends, Friend.friend_username == friends.c.username)
+        .where(Friend.status == "accepted"),
+    ).subquery()
+    mutual = func.count().label("mutual_friends")
+    query = (
+        select(second_degree.c.candidate, mutual)
+        .where(second_degree.c.candidate != user)
+        .where(second_degree.c.candidate.not_in(related))
+        .group_by(second_degree.c.candidate)
+        .order_by(mutual.desc(), second_degree.c.candidate)
+        .limit(limit)
+    )
+    with Session(get_read_engine()) as session:
         get_user(session, user)  # validate existence
-        results = session.exec(
-            select(Friend).where(
-                ((Friend.user == user) | (Friend.friend_username == user))
-                & (Friend.status == "accepted")
-            )
-        ).all()
-        return results
+        rows = session.exec(query).all()
+
+    return {
+        "user": user,
+        "suggestions": [{"user": candidate, "mutual_friends": count} for candidate, count in rows],
+    }
 
 
 @router.delete("/friends/remove")
@@ -115,47 +201,203 @@ def remove_friend(user: str, friend_username: str):
     """
     Remove a friendship between two users.
     """
-    with Session(engine) as session:
-        friendship = session.exec(
-            select(Friend).where(
-                ((Friend.user == user) & (Friend.friend_username == friend_username))
-                | ((Friend.user == friend_username) & (Friend.friend_username == user))
-            )
-        ).first()
+    with Session(get_engine()) as session:
+        friendship = find_friendship(session, user, friend_username)
 
         if not friendship:
             raise HTTPException(status_code=404, detail="Friendship not found.")
 
         session.delete(friendship)
+        forget_friendship(session, user, friend_username)
         session.commit()
         return {"message": f"{friend_username} removed from friends."}
 
 
+# ------------------------------------------------------------------
+# 🔹 Activity Feed
+# ------------------------------------------------------------------
+
+@router.get("/feed")
+def get_feed(user: str, cursor: Optional[int] = None, limit: int = Query(20, ge=1, le=100)):
+    """
+    Friends' recent activity (study sessions, quests, boss battles, reflections),
+    newest first. Pass `next_cursor` back as `cursor` to load older items.
+    """
+    with Session(get_read_engine()) as session:
+        get_user(session, user)  # validate existence
+        events = read_feed(session, user, cursor, limit)
+
+    return {
+        "user": user,
+        "items": [
+            {
+                "id": event.id,
+                "actor": event.actor,
+                "kind": event.kind,
+                "data": json.loads(event.payload),
+                "created_at": event.created_at,
+            }
+            for event in events
+        ],
+        "next_cursor": events[-1].id if len(events) == limit else None,
+    }
+
+
 # ------------------------------------------------------------------
 # 🔹 Leaderboard
 # ------------------------------------------------------------------
 
-@router.get("/leaderboard", response_model=List[LeaderboardRead])
-def get_leaderboard(limit: int = 10):
+@router.get("/leaderboard", response_model=List[LeaderboardEntry])
+def get_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    period: Optional[str] = Query(None, pattern="^(daily|weekly)$"),
+):
     """
-    Fetch the top users by XP (and streak if available).
+    Fetch the top users by all-time XP, with their current streak.
+    - period=daily / weekly: rank by XP earned in the period instead, from
+      the latest persisted snapshot; that XP is returned as `period_xp`
     """
-    with Session(engine) as session:
-        users = session.exec(select(User).order_by(User.total_xp.desc())).all()
-        if not users:
-            raise HTTPException(status_code=404, detail="No users found.")
+    if period:
+        return _period_leaderboard(period, limit)
+
+    if xp_ranking.ensure_fresh():
+        top = xp_ranking.top(limit)
+    else:
+        with Session(get_read_engine()) as session:
+            rows = session.exec(
+                select(User.username, User.total_xp).order_by(User.total_xp.desc()).limit(limit)
+            ).all()
+        top, previous_xp = [], None
+        for position, (username, total_xp) in enumerate(rows, start=1):
+            rank = top[-1][0] if total_xp == previous_xp else position
+            top.append((rank, username, total_xp))
+            previous_xp = total_xp
+
+    if not top:
+        raise HTTPException(status_code=404, detail="No users found.")
+
+    with Session(get_read_engine()) as session:
+        streaks = dict(session.exec(streaks_query([username for _, username, _ in top])).all())
+    now = datetime.utcnow()
+    return [
+        LeaderboardEntry(
+            rank=rank,
+            user=username,
+            total_xp=total_xp,
+            current_streak=streaks.get(username, 0),
+            last_updated=now,
+        )
+        for rank, username, total_xp in top
+    ]
+
+
+def _period_leaderboard(period: str, limit: int) -> List[LeaderboardEntry]:
+    with Session(get_read_engine()) as session:
+        period_start = latest_period_start(session, period)
+        rows = session.exec(
+            select(Leaderboard, User.total_xp)
+            .join(User, User.username == Leaderboard.user)
+            .where(Leaderboard.period == period, Leaderboard.period_start == period_start)
+            .order_by(Leaderboard.total_xp.desc(), Leaderboard.current_streak.desc(), Leaderboard.user)
+            .limit(limit)
+        ).all() if period_start else []
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No {period} leaderboard snapshot yet.")
+
+    entries, previous = [], None
+    for position, (row, total_xp) in enumerate(rows, start=1):
+        key = (row.total_xp, row.current_streak)
+        rank = entries[-1].rank if key == previous else position
+        entries.append(LeaderboardEntry(
+            rank=rank,
+            user=row.user,
+            total_xp=total_xp or 0,
+            period_xp=row.total_xp,  # the snapshot's total_xp column holds XP earned in the period
+            current_streak=row.current_streak,
+            last_updated=row.last_updated,
+        ))
+        previous = key
+    return entries
+
 
-        leaderboard_entries = []
-        for rank, user in enumerate(users[:limit], start=1):
-            entry = Leaderboard(
-                user=user.username,
-                total_xp=user.total_xp,
-                current_streak=0,  # placeholder if streak not tracked globally
-                last_updated=datetime.utcnow(),
-            )
-            leaderboard_entries.append(entry)
+@router.get("/leaderboard/friends")
+def get_friends_leaderboard(
+    user: str,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Rank a user and their accepted friends by XP, then streak
+    (streaks from the latest daily leaderboard snapshot).
+    One query: the friend ids come from two index probes on Friend
+    (user, status) and (friend_username, status), joined to User.
+    """
+    circle = union_all(
+        select(Friend.friend_username.label("username"))
+        .where(Friend.user == user, Friend.status == "accepted"),
+        select(Friend.user.label("username"))
+        .where(Friend.friend_username == user, Friend.status == "accepted"),
+        select(literal(user).label("username")),
+    ).subquery()
+    latest_daily = (
+        select(func.max(Leaderboard.period_start))
+        .where(Leaderboard.period == "daily")
+        .scalar_subquery()
+    )
+    streak = func.coalesce(Leaderboard.current_streak, 0)
+    ordering = (User.total_xp.desc(), streak.desc())
+    query = (
+        select(
+            User.username,
+            User.total_xp,
+            streak.label("current_streak"),
+            func.rank().over(order_by=ordering).label("rank"),
+            func.count().over().label("total"),
+        )
+        .join(circle, circle.c.username == User.username)
+        .outerjoin(Leaderboard, (Leaderboard.user == User.username)
+                   & (Leaderboard.period == "daily")
+                   & (Leaderboard.period_start == latest_daily))
+        .order_by(*ordering, User.username)
+        .limit(limit)
+        .offset(offset)
+    )
+    with Session(get_read_engine()) as session:
+        rows = session.exec(query).all()
+
+    if not rows and offset == 0:
+        raise HTTPException(status_code=404, detail=f"User '{user}' not found.")
+
+    return {
+        "user": user,
+        "total": rows[0].total if rows else None,
+        "entries": [
+            {
+                "rank": row.rank,
+                "user": row.username,
+                "total_xp": row.total_xp,
+                "current_streak": row.current_streak,
+            }
+            for row in rows
+        ],
+    }
+
+
+@router.get("/leaderboard/rank/{username}")
+def get_leaderboard_rank(username: str):
+    """
+    A single user's global XP rank (1 = most XP; ties share a rank).
+    """
+    ranked = xp_ranking.rank(username) if xp_ranking.ensure_fresh() else None
+    if ranked:
+        rank, total_xp = ranked
+        return {"user": username, "rank": rank, "total_xp": total_xp, "total_users": len(xp_ranking)}
 
-        return leaderboard_entries
+    with Session(get_read_engine()) as session:
+        user = get_user(session, username)
+        ahead = session.exec(select(func.count(User.id)).where(User.total_xp > user.total_xp)).one()
+        total_users = session.exec(select(func.count(User.id))).one()
+        return {"user": username, "rank": ahead + 1, "total_xp": user.total_xp, "total_users": total_users}
 
 
 # ------------------------------------------------------------------
@@ -172,6 +414,10 @@ def social_root():
             "Respond to Request": "/social/friends/respond",
             "List Friends": "/social/friends/list",
             "Remove Friend": "/social/friends/remove",
-            "Leaderboard": "/social/leaderboard"
+            "Friend Suggestions": "/social/friends/suggestions?user=<username>",
+            "Activity Feed": "/social/feed?user=<username>",
+            "Leaderboard": "/social/leaderboard",
+            "Friends Leaderboard": "/social/leaderboard/friends?user=<username>",
+            "My Rank": "/social/leaderboard/rank/{username}"
         }
     }
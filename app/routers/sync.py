@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException
+from sqlmodel import Session, select
+
+from app.database import get_engine
+from app.models import User
+from app.routers.socialfeatures import as_friend_read
+from app.sync import changes_since, parse_cursor
+from app.xp import level_progress
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+
+@router.get("")
+def sync(user: str, since: str | None = None):
+    """
+    Everything that changed for `user` since `since` (the `cursor` returned by
+    the previous call; omit it for a full sync) in one response:
+    - `changes`: changed rows per table (user, progress, quests, avatar,
+      reflections, friends, badges)
+    - `deleted`: ids deleted per table; apply these before `changes`
+    - `cursor` / `has_more`: pass `cursor` back, immediately if `has_more`
+    - `full`: true when the client should replace its local copy
+    """
+    try:
+        since_at = parse_cursor(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor.")
+
+    with Session(get_engine()) as session:
+        if not session.exec(select(User.id).where(User.username == user)).first():
+            raise HTTPException(status_code=404, detail="User not found. Please register first.")
+
+    result = changes_since(user, since_at)
+    changes = result["changes"]
+    changes["friends"] = [as_friend_read(f) for f in changes["friends"]]
+    if changes["user"]:
+        current_level, xp_into_level, xp_to_next = level_progress(changes["user"][0].total_xp)
+        result["level"] = {"current_level": current_level, "total_xp": xp_into_level, "xp_to_next": xp_to_next}
+    return result
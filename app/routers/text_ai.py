@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException
 from sqlmodel import Session, select
 from datetime import datetime
-from app.database import engine
+from app.activity import record_activity
+from app.database import get_engine, get_read_engine
 from app.models import TextAIReflection, User
 from app.schemas import TextAIReflectionCreate, TextAIReflectionRead
+from app.xp import grant_xp
 
 
 router = APIRouter(prefix="/text-ai", tags=["Text AI Mentor"])
@@ -50,7 +52,7 @@ def add_reflection(data: TextAIReflectionCreate):
     Add a new text reflection entry and analyze it using AI feedback logic.
     Returns feedback, summary, and XP reward.
     """
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         user_exists = session.exec(select(User).where(User.username == data.user)).first()
         if not user_exists:
             raise HTTPException(status_code=404, detail="User not found. Please register first.")
@@ -68,6 +70,12 @@ def add_reflection(data: TextAIReflectionCreate):
         )
 
         session.add(reflection)
+        session.flush()
+        grant_xp(session, data.user, reflection.xp_reward, "reflection", reflection.id)
+        record_activity(session, data.user, "reflection", {
+            "summary": ai_result["summary"],
+            "xp_reward": ai_result["xp_reward"],
+        })
         session.commit()
         session.refresh(reflection)
 
@@ -79,7 +87,7 @@ def list_reflections(user: str):
     """
     Get all text reflections submitted by a specific user.
     """
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         user_exists = session.exec(select(User).where(User.username == user)).first()
         if not user_exists:
             raise HTTPException(status_code=404, detail="User not found. Please register first.")
@@ -96,7 +104,7 @@ def get_reflection(reflection_id: int):
     """
     Retrieve a specific reflection by ID.
     """
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         reflection = session.get(TextAIReflection, reflection_id)
         if not reflection:
             raise HTTPException(status_code=404, detail="Reflection not found.")
@@ -108,10 +116,11 @@ def delete_reflection(reflection_id: int):
     """
     Delete a specific text reflection entry.
     """
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         reflection = session.get(TextAIReflection, reflection_id)
         if not reflection:
             raise HTTPException(status_code=404, detail="Reflection not found.")
+        grant_xp(session, reflection.user, -reflection.xp_reward, "reflection", reflection.id)
         session.delete(reflection)
         session.commit()
         return {"message": f"Reflection {reflection_id} deleted successfully."}
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session, select
 
-from app.database import engine
+from app.cache import cached
+from app.database import get_engine, get_read_engine
 from app.models import User
 from app.schemas import UserCreate, UserRead
+from app.user_import import decode_payload, import_users, parse_users
+from app.xp import grant_xp
+from app.xp_ranking import xp_ranking
 
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -12,30 +17,66 @@ router = APIRouter(prefix="/users", tags=["Users"])
 @router.post("/", response_model=UserRead, status_code=201)
 def register_user(payload: UserCreate):
     """Create a new StudyQuest user."""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         existing = session.exec(select(User).where(User.username == payload.username)).first()
         if existing:
             raise HTTPException(status_code=409, detail="Username already exists.")
 
-        user = User(username=payload.username, email=payload.email, total_xp=payload.total_xp)
+        user = User(username=payload.username, email=payload.email)
         session.add(user)
+        session.flush()
+        grant_xp(session, user.username, payload.total_xp, "opening")
         session.commit()
         session.refresh(user)
+        xp_ranking.set(user.username, user.total_xp)
         return user
 
 
+@router.post("/bulk")
+async def bulk_register_users(request: Request):
+    """
+    Register many users at once (class / school onboarding).
+    Body: a JSON list of {"username", "email", "total_xp"} objects, or CSV
+    with a `username,email[,total_xp]` header when Content-Type is text/csv.
+    Existing usernames are skipped, not treated as errors.
+    """
+    content_type = request.headers.get("content-type", "")
+    body = await request.body()
+    try:
+        rows = parse_users(decode_payload(body), "csv" if "csv" in content_type else "json")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid payload: {exc}")
+    return await run_in_threadpool(import_users, rows)
+
+
 @router.get("/", response_model=list[UserRead])
 def list_users():
     """List all registered users."""
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         users = session.exec(select(User)).all()
         return users
 
 
+@router.get("/search", response_model=list[UserRead])
+def search_users(q: str = Query(..., min_length=1, max_length=50), limit: int = Query(10, ge=1, le=25)):
+    """
+    Username prefix search for friend lookup / typeahead.
+    Served by an index range scan (username >= q AND username < q + U+10FFFF);
+    on Postgres, a LIKE 'q%' prefix match backed by a text_pattern_ops index.
+    """
+    if get_engine().dialect.name == "postgresql":
+        condition = User.username.startswith(q, autoescape=True)
+    else:
+        condition = (User.username >= q) & (User.username < q + "\U0010ffff")
+    with Session(get_read_engine()) as session:
+        return session.exec(select(User).where(condition).order_by(User.username).limit(limit)).all()
+
+
 @router.get("/{username}", response_model=UserRead)
+@cached("user", scope="username")
 def get_user(username: str):
     """Retrieve a specific user by username."""
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         user = session.exec(select(User).where(User.username == username)).first()
         if not user:
             raise HTTPException(status_code=404, detail="User not found.")
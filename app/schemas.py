@@ -169,6 +169,7 @@ class FriendCreate(FriendBase):
 
 class FriendRead(FriendBase):
     id: int
+    requester: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -185,3 +186,8 @@ class LeaderboardRead(LeaderboardBase):
 
     class Config:
         orm_mode = True
+
+
+class LeaderboardEntry(LeaderboardBase):
+    rank: int
+    period_xp: Optional[int] = None  # XP earned in the requested period
@@ -0,0 +1,154 @@
+"""
+Slow-query log.
+
+`install(engine)` (called from app/database.py for the primary and every
+read replica) times every statement. One
+slower than SLOW_QUERY_MS (default 200; 0 disables) is logged with its bound
+parameters and originating route, and added to an aggregate keyed by query
+fingerprint (literals and IN-lists collapsed). The first time a fingerprint
+shows up, its plan is captured with EXPLAIN on a background thread, so the
+request that ran it is not delayed.
+
+`top(n)` returns the fingerprints with the most total slow time, which is
+what `GET /admin/slow-queries` shows.
+"""
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.metrics import current_route
+
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+MAX_FINGERPRINTS = 500
+EXPLAIN_QUEUE_SIZE = 100
+
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\([^)]*\)s|%s|:\w+|\$\d+)(?:\s*,\s*(?:\?|%\([^)]*\)s|%s|:\w+|\$\d+))*\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+def fingerprint(statement: str) -> str:
+    sql = " ".join(statement.split())
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _IN_LIST.sub("(?+)", sql)
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS):
+        self.threshold_ms = threshold_ms
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._explain_queue: "queue.Queue" = queue.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+        self._worker: Optional[threading.Thread] = None
+
+    # -- recording -------------------------------------------------------
+
+    def record(self, engine: Engine, statement: str, parameters: Any, elapsed_ms: float, executemany: bool) -> None:
+        route = current_route()
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s | params=%s",
+            elapsed_ms, route or "background", " ".join(statement.split()), repr(parameters)[:500],
+        )
+        key = fingerprint(statement)
+        with self._lock:
+            entry = self._stats.get(key)
+            is_new = entry is None
+            if is_new:
+                if len(self._stats) >= MAX_FINGERPRINTS:
+                    smallest = min(self._stats, key=lambda k: self._stats[k]["total_ms"])
+                    del self._stats[smallest]
+                entry = self._stats[key] = {
+                    "fingerprint": key,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "routes": {},
+                    "example": {"statement": statement, "parameters": repr(parameters)[:500]},
+                    "plan": None,
+                    "last_seen": None,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["last_seen"] = datetime.utcnow()
+            route_key = route or "background"
+            entry["routes"][route_key] = entry["routes"].get(route_key, 0) + 1
+        if is_new and not executemany:
+            self._queue_explain(engine, key, statement, parameters)
+
+    def top(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = sorted(self._stats.values(), key=lambda e: e["total_ms"], reverse=True)[:limit]
+            return [
+                {**e, "routes": dict(e["routes"]), "avg_ms": round(e["total_ms"] / e["count"], 3),
+                 "total_ms": round(e["total_ms"], 3), "max_ms": round(e["max_ms"], 3)}
+                for e in entries
+            ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    # -- EXPLAIN capture (background thread) ---------------------------------
+
+    def _queue_explain(self, engine: Engine, key: str, statement: str, parameters: Any) -> None:
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._explain_loop, name="slow-query-explain", daemon=True)
+                    self._worker.start()
+        try:
+            self._explain_queue.put_nowait((engine, key, statement, parameters))
+        except queue.Full:
+            pass  # a burst of new slow queries; their plans can be captured next time
+
+    def _explain_loop(self) -> None:
+        while True:
+            engine, key, statement, parameters = self._explain_queue.get()
+            prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+            try:
+                with engine.connect() as conn:
+                    rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+                plan = [" | ".join(str(col) for col in row) for row in rows]
+            except Exception as exc:  # e.g. a statement type the database cannot EXPLAIN
+                plan = [f"EXPLAIN failed: {exc}"]
+            with self._lock:
+                if key in self._stats:
+                    self._stats[key]["plan"] = plan
+
+
+slow_query_log: Optional[SlowQueryLog] = None
+
+
+def install(engine: Engine) -> Optional[SlowQueryLog]:
+    """Attach the slow-query hooks to `engine` (no-op when SLOW_QUERY_MS is 0)."""
+    global slow_query_log
+    if SLOW_QUERY_MS <= 0:
+        return None
+    if slow_query_log is None:
+        slow_query_log = SlowQueryLog()
+    log = slow_query_log
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany) -> None:
+        context._slow_query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed_ms = (time.perf_counter() - context._slow_query_started) * 1000
+        if elapsed_ms >= log.threshold_ms and not statement.startswith("EXPLAIN"):
+            log.record(conn.engine, statement, parameters, elapsed_ms, executemany)
+
+    return log
@@ -0,0 +1,191 @@
+"""
+Delta sync for the mobile client.
+
+Every synced model carries an `updated_at` column (bumped on UPDATE) with a
+`(owner, updated_at)` index, and deletes of those models leave a `Tombstone`
+per owner (written by a `before_flush` hook). `changes_since` answers
+"what changed for this user after <cursor>" with one index range scan per
+table instead of the six full-list endpoints the app used to call.
+
+Cursors are server timestamps. The next cursor is set `SYNC_OVERLAP_SECONDS`
+in the past so rows stamped just before a slow commit are not skipped; the
+client applies `deleted` and then `changes` as idempotent upserts, so the
+overlap only costs a few re-sent rows. Cursors older than
+`TOMBSTONE_RETENTION_DAYS` get a full resync instead.
+
+A page cut short by `SYNC_PAGE_SIZE` resumes from a keyset position
+`<timestamp>,<id>` (rows after `(updated_at, id)`), so rows sharing one
+timestamp, e.g. everything stamped by a migration backfill, are never
+skipped. One position serves every table: it is the smallest of the
+per-table positions, and every table has already sent all its rows up to
+its own position.
+
+    python -m app.sync prune     # drop tombstones past the retention window
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, event, or_
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from app.database import get_engine, init_db
+from app.models import Avatar, Badge, Friend, Progress, Quest, TextAIReflection, Tombstone, User
+
+
+SYNC_PAGE_SIZE = 1000
+SYNC_OVERLAP_SECONDS = 5
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "30"))
+
+# Sync name -> (model, columns naming the users who see the row; empty = everyone)
+SYNCED_TABLES = {
+    "user": (User, ("username",)),
+    "progress": (Progress, ("user",)),
+    "quests": (Quest, ("assigned_to",)),
+    "avatar": (Avatar, ("user",)),
+    "reflections": (TextAIReflection, ("user",)),
+    "friends": (Friend, ("user", "friend_username")),
+    "badges": (Badge, ()),
+}
+_SYNC_NAMES = {model: name for name, (model, _) in SYNCED_TABLES.items()}
+
+
+# ------------------------------------------------------------------
+# 🔹 Tombstones
+# ------------------------------------------------------------------
+
+@event.listens_for(OrmSession, "before_flush")
+def _record_tombstones(session, flush_context, instances) -> None:
+    for obj in list(session.deleted):
+        name = _SYNC_NAMES.get(type(obj))
+        if name is None or obj.id is None:
+            continue
+        _, owner_columns = SYNCED_TABLES[name]
+        owners = {getattr(obj, column) for column in owner_columns} or {None}
+        for owner in owners:
+            session.add(Tombstone(table_name=name, row_id=obj.id, owner=owner))
+
+
+def prune_tombstones(days: int = TOMBSTONE_RETENTION_DAYS) -> int:
+    with Session(get_engine()) as db:
+        result = db.exec(delete(Tombstone).where(Tombstone.deleted_at < datetime.utcnow() - timedelta(days=days)))
+        db.commit()
+        return result.rowcount
+
+
+# ------------------------------------------------------------------
+# 🔹 Change feed
+# ------------------------------------------------------------------
+
+# (timestamp, id): rows after it in (timestamp, id) order. A plain timestamp
+# cursor has id None and means rows strictly after the timestamp.
+Position = Tuple[datetime, Optional[int]]
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Position]:
+    """Raises ValueError for a malformed cursor; None means "full sync"."""
+    if not cursor:
+        return None
+    stamp, _, row_id = cursor.partition(",")
+    return datetime.fromisoformat(stamp), int(row_id) if row_id else None
+
+
+def format_cursor(position: Position) -> str:
+    stamp, row_id = position
+    return stamp.isoformat() if row_id is None else f"{stamp.isoformat()},{row_id}"
+
+
+def _after(query, stamp_column, id_column, position: Optional[Position]):
+    """Keyset filter that keeps the (owner, timestamp) index range scan."""
+    if position is None:
+        return query
+    stamp, row_id = position
+    if row_id is None:
+        return query.where(stamp_column > stamp)
+    return query.where(stamp_column >= stamp).where(or_(stamp_column > stamp, id_column > row_id))
+
+
+def _page(rows: List[Any], column: str) -> Tuple[List[Any], Optional[Position]]:
+    """
+    Trim a merged, `(column, id)`-ordered fetch to one page. Returns the rows
+    and, if truncated, the position of the last row sent.
+    """
+    if len(rows) <= SYNC_PAGE_SIZE:
+        return rows, None
+    rows = rows[:SYNC_PAGE_SIZE]
+    return rows, (getattr(rows[-1], column), rows[-1].id)
+
+
+def _merged(db: Session, queries, column: str) -> List[Any]:
+    """Run each query (one index range scan apiece) and merge them without duplicates."""
+    rows = {}
+    for query in queries:
+        for row in db.exec(query).all():
+            rows[row.id] = row
+    return sorted(rows.values(), key=lambda r: (getattr(r, column), r.id))
+
+
+def _changed_rows(db: Session, name: str, username: str, since: Optional[Position]):
+    model, owner_columns = SYNCED_TABLES[name]
+    queries = []
+    for column in owner_columns or (None,):
+        query = select(model)
+        if column is not None:
+            query = query.where(getattr(model, column) == username)
+        query = _after(query, model.updated_at, model.id, since)
+        queries.append(query.order_by(model.updated_at, model.id).limit(SYNC_PAGE_SIZE + 1))
+    return _page(_merged(db, queries, "updated_at"), "updated_at")
+
+
+def _deleted_rows(db: Session, username: str, since: Position):
+    # Per-user and shared (owner NULL) tombstones as two probes of the
+    # (owner, deleted_at) index; an OR of the two would scan the table.
+    queries = []
+    for owner in (Tombstone.owner == username, Tombstone.owner.is_(None)):
+        query = _after(select(Tombstone).where(owner), Tombstone.deleted_at, Tombstone.id, since)
+        queries.append(query.order_by(Tombstone.deleted_at, Tombstone.id).limit(SYNC_PAGE_SIZE + 1))
+    return _page(_merged(db, queries, "deleted_at"), "deleted_at")
+
+
+def changes_since(username: str, since: Optional[Position]) -> Dict[str, Any]:
+    """Rows changed (and ids deleted) for `username` after the `since` position."""
+    started = datetime.utcnow()
+    full = since is None or since[0] < started - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    if full:
+        since = None
+
+    changes, deleted, resume_points = {}, {}, []
+    with Session(get_engine()) as db:
+        for name in SYNCED_TABLES:
+            rows, resume = _changed_rows(db, name, username, since)
+            changes[name] = rows
+            if resume:
+                resume_points.append(resume)
+
+        if not full:
+            tombstones, resume = _deleted_rows(db, username, since)
+            if resume:
+                resume_points.append(resume)
+            for tombstone in tombstones:
+                deleted.setdefault(tombstone.table_name, []).append(tombstone.row_id)
+
+    if resume_points:
+        cursor = min(resume_points)
+    else:
+        cursor = (started - timedelta(seconds=SYNC_OVERLAP_SECONDS), None)
+    return {
+        "cursor": format_cursor(cursor),
+        "has_more": bool(resume_points),
+        "full": full,
+        "changes": changes,
+        "deleted": deleted,
+    }
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["prune"]:
+        sys.exit("usage: python -m app.sync prune")
+    init_db()
+    print(f"Pruned {prune_tombstones()} tombstones.")
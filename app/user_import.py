@@ -0,0 +1,147 @@
+"""
+Bulk user registration (school / class onboarding).
+
+Rows are de-duplicated in memory, then written with chunked multi-row
+`INSERT ... ON CONFLICT (username) DO NOTHING RETURNING username` statements,
+so existing usernames are skipped by the database in the same statement that
+inserts the rest. Starting XP is recorded as one "opening" ledger entry per
+created user.
+
+    python -m app.user_import users.csv     # header: username,email[,total_xp]
+    python -m app.user_import users.json    # [{"username": ..., "email": ...}, ...]
+"""
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+
+from app.database import get_engine, init_db
+from app.models import User, XPLedger
+from app.schemas import UserCreate
+from app.xp_ranking import xp_ranking
+
+
+IMPORT_CHUNK_SIZE = 1000
+
+
+def decode_payload(body: bytes) -> str:
+    """UTF-8 text of an upload; ValueError names the line of the first bad byte."""
+    try:
+        return body.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        line = body[:exc.start].count(b"\n") + 1
+        raise ValueError(f"line {line}: not valid UTF-8") from None
+
+
+def _validate_row(number: int, item: Any) -> Dict[str, Any]:
+    if not isinstance(item, dict):
+        raise ValueError(f"row {number}: expected an object, got {type(item).__name__}")
+    try:
+        return UserCreate.model_validate(item).model_dump()
+    except ValidationError as exc:
+        error = exc.errors()[0]
+        field = ".".join(str(part) for part in error["loc"])
+        raise ValueError(f"row {number}: {field}: {error['msg']}") from None
+
+
+def parse_users(content: str, fmt: str) -> List[Dict[str, Any]]:
+    """
+    Parse a CSV (with header) or JSON list payload into row dicts, each
+    validated as a `UserCreate`. Raises ValueError naming the first bad row.
+    """
+    if fmt == "csv":
+        # Empty cells mean "not given"; cells past the header (key None) are ignored.
+        data = [
+            {key: value for key, value in row.items() if key is not None and value not in ("", None)}
+            for row in csv.DictReader(io.StringIO(content))
+        ]
+    else:
+        data = json.loads(content)
+        if isinstance(data, dict):
+            data = data.get("users", [])
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON list of users.")
+    return [_validate_row(number, item) for number, item in enumerate(data, start=1)]
+
+
+def _insert_ignoring_conflicts():
+    dialect = get_engine().dialect.name
+    if dialect == "postgresql":
+        statement = postgresql_insert(User)
+    elif dialect == "sqlite":
+        statement = sqlite_insert(User)
+    else:
+        raise RuntimeError(f"Bulk user import is not supported on '{dialect}'.")
+    return (
+        statement.on_conflict_do_nothing(index_elements=["username"])
+        .returning(User.username, User.total_xp)
+    )
+
+
+def import_users(items: Iterable[Dict[str, Any]], chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict[str, int]:
+    """Create every new username; returns created / skipped / invalid counts."""
+    now = datetime.utcnow()
+    seen = set()
+    rows, invalid, skipped = [], 0, 0
+    for item in items:
+        username = str(item.get("username") or "").strip()
+        if not username:
+            invalid += 1
+            continue
+        if username in seen:
+            skipped += 1
+            continue
+        seen.add(username)
+        try:
+            total_xp = int(item.get("total_xp") or 0)
+        except (TypeError, ValueError):
+            invalid += 1
+            continue
+        rows.append({
+            "username": username,
+            "email": (item.get("email") or None),
+            "total_xp": total_xp,
+            "join_date": now,
+        })
+
+    created = []
+    statement = _insert_ignoring_conflicts()
+    with Session(get_engine()) as session:
+        for i in range(0, len(rows), chunk_size):
+            # executemany + RETURNING: SQLAlchemy batches the chunk into
+            # multi-row VALUES ("insertmanyvalues") with one cached compile.
+            created += session.execute(statement, rows[i:i + chunk_size]).all()
+        opening = [
+            {"user": username, "amount": total_xp, "source": "opening", "created_at": now}
+            for username, total_xp in created
+            if total_xp
+        ]
+        if opening:
+            session.exec(insert(XPLedger), params=opening)
+        session.commit()
+
+    for username, total_xp in created:
+        xp_ranking.set(username, total_xp)
+    return {
+        "created": len(created),
+        "skipped": skipped + len(rows) - len(created),
+        "invalid": invalid,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m app.user_import <users.csv|users.json>")
+    path = sys.argv[1]
+    with open(path, encoding="utf-8") as fh:
+        users = parse_users(fh.read(), "csv" if path.endswith(".csv") else "json")
+    init_db()
+    print(import_users(users))
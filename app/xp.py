@@ -0,0 +1,181 @@
+"""
+XP ledger.
+
+Every XP change is appended to `XPLedger` by `grant_xp`, which also bumps the
+denormalized `User.total_xp` counter with a single `UPDATE ... SET total_xp =
+total_xp + :amount` in the caller's transaction. Reads (dashboard,
+leaderboards, levels) only ever look at the counter; the ledger is the
+source of truth that `reconcile_xp` checks the counters against.
+
+    python -m app.xp reconcile                 # verify + repair counters
+    python -m app.xp compact --days 90         # also fold old entries into one row per user
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, event, insert, update
+from sqlmodel import Session, func, select
+
+from app.database import get_engine, init_db
+from app.models import User, XPLedger
+from app.xp_ranking import xp_ranking
+
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_CHUNK_SIZE = 5000
+
+
+# ------------------------------------------------------------------
+# 🔹 Write path
+# ------------------------------------------------------------------
+
+def _publish_totals(session: Session) -> None:
+    for username, total_xp in session.info.pop("xp_totals", {}).items():
+        xp_ranking.set(username, total_xp)
+
+
+def _discard_totals(session: Session) -> None:
+    session.info.pop("xp_totals", None)
+
+
+def grant_xp(session: Session, username: str, amount: int, source: str, ref_id: Optional[int] = None) -> Optional[int]:
+    """
+    Append a ledger entry and bump the user's counter. Returns the new total,
+    or None if the user does not exist. Committed together with the caller's
+    work; the in-memory ranking is updated once that commit succeeds.
+    """
+    if not amount:
+        return None
+    total_xp = session.exec(
+        update(User)
+        .where(User.username == username)
+        .values(total_xp=func.coalesce(User.total_xp, 0) + amount)
+        .returning(User.total_xp)
+        .execution_options(synchronize_session=False, cache_scope=username)
+    ).scalar_one_or_none()
+    if total_xp is None:
+        return None
+    session.add(XPLedger(user=username, amount=amount, source=source, ref_id=ref_id))
+
+    if not session.info.get("xp_listening"):
+        session.info["xp_listening"] = True
+        event.listen(session, "after_commit", _publish_totals)
+        event.listen(session, "after_rollback", _discard_totals)
+    session.info.setdefault("xp_totals", {})[username] = total_xp
+    return total_xp
+
+
+# ------------------------------------------------------------------
+# 🔹 Levels (derived from the counter)
+# ------------------------------------------------------------------
+
+def level_progress(total_xp: int) -> Tuple[int, int, int]:
+    """
+    `(current_level, xp_into_level, xp_to_next)` for a lifetime XP total.
+    Level 2 needs 100 XP and every later level needs 50 more than the last.
+    """
+    level, remaining, needed = 1, max(total_xp or 0, 0), 100
+    while remaining >= needed:
+        remaining -= needed
+        level += 1
+        needed += 50
+    return level, remaining, needed
+
+
+# ------------------------------------------------------------------
+# 🔹 Reconciliation / compaction job
+# ------------------------------------------------------------------
+
+def reconcile_xp(compact_before: Optional[datetime] = None, chunk_size: int = RECONCILE_CHUNK_SIZE) -> Dict[str, int]:
+    """
+    Walk users in keyset chunks and compare `User.total_xp` with the ledger
+    sum, repairing counters that drifted (the ledger wins).
+
+    With `compact_before`, entries older than that are also folded into one
+    "opening" entry per user, keeping the ledger (and this job) small.
+    Each chunk is its own transaction.
+    """
+    stats = {"users": 0, "mismatched": 0, "compacted_entries": 0}
+    last_username = ""
+    while True:
+        with Session(get_engine()) as db:
+            counters = dict(db.exec(
+                select(User.username, User.total_xp)
+                .where(User.username > last_username)
+                .order_by(User.username)
+                .limit(chunk_size)
+            ).all())
+            if not counters:
+                break
+            usernames = list(counters)
+            sums = dict(db.exec(
+                select(XPLedger.user, func.sum(XPLedger.amount))
+                .where(XPLedger.user.in_(usernames))
+                .group_by(XPLedger.user)
+            ).all())
+
+            repaired = {}
+            for username, counter in counters.items():
+                if (counter or 0) == (sums.get(username) or 0):
+                    continue
+                # Re-check under the row lock: a concurrent grant_xp may have
+                # committed between the two reads above.
+                counter = db.exec(
+                    select(User.total_xp).where(User.username == username).with_for_update()
+                ).one()
+                expected = db.exec(
+                    select(func.coalesce(func.sum(XPLedger.amount), 0)).where(XPLedger.user == username)
+                ).one()
+                if (counter or 0) != expected:
+                    logger.warning("XP counter drift for %s: counter=%s ledger=%s", username, counter, expected)
+                    db.exec(
+                        update(User)
+                        .where(User.username == username)
+                        .values(total_xp=expected)
+                        .execution_options(cache_scope=username)
+                    )
+                    repaired[username] = expected
+
+            if compact_before is not None:
+                stats["compacted_entries"] += _compact_chunk(db, usernames, compact_before)
+            db.commit()
+
+        for username, expected in repaired.items():
+            xp_ranking.set(username, expected)
+        stats["users"] += len(usernames)
+        stats["mismatched"] += len(repaired)
+        last_username = usernames[-1]
+    return stats
+
+
+def _compact_chunk(db: Session, usernames, before: datetime) -> int:
+    old = (XPLedger.user.in_(usernames), XPLedger.created_at < before)
+    rows = db.exec(
+        select(XPLedger.user, func.sum(XPLedger.amount), func.count())
+        .where(*old)
+        .group_by(XPLedger.user)
+    ).all()
+    # Users whose old history is already a single opening entry are left alone.
+    rows = [(username, amount, count) for username, amount, count in rows if count > 1]
+    if not rows:
+        return 0
+    db.exec(delete(XPLedger).where(XPLedger.user.in_([r[0] for r in rows]), XPLedger.created_at < before))
+    db.exec(insert(XPLedger), params=[
+        {"user": username, "amount": amount, "source": "opening", "ref_id": None, "created_at": before}
+        for username, amount, _ in rows
+    ])
+    return sum(count for _, _, count in rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["reconcile", "compact"])
+    parser.add_argument("--days", type=int, default=90, help="compact entries older than this many days")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    cutoff = datetime.utcnow() - timedelta(days=args.days) if args.command == "compact" else None
+    print(reconcile_xp(compact_before=cutoff))
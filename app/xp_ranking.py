@@ -0,0 +1,124 @@
+"""
+In-memory global XP ranking.
+
+Keeps every user's XP in a dict plus a list of `(-total_xp, username)` kept
+sorted with `bisect`, so top-N is an O(N) slice and a user's rank is an
+O(log n) binary search. Seeded from `User` on first use and updated by every
+code path in this process that changes `User.total_xp`.
+
+Other worker processes change XP too, so `ensure_fresh()` re-seeds from the
+database once the snapshot is older than XP_RANKING_TTL_SECONDS (default 30);
+workers therefore agree within one TTL. Seeding scans the whole `User`
+table, so it runs on a background thread and the result is swapped in:
+readers keep using the previous snapshot (or, before the first seed, the
+callers' SQL fallback), and local updates made during the seed are
+replayed on top of it.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.database import get_engine
+from app.models import User
+
+
+logger = logging.getLogger(__name__)
+
+XP_RANKING_TTL_SECONDS = float(os.getenv("XP_RANKING_TTL_SECONDS", "30"))
+
+
+class XPRanking:
+    def __init__(self, ttl_seconds: float = XP_RANKING_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._xp: Dict[str, int] = {}
+        self._order: List[Tuple[int, str]] = []
+        self._lock = threading.Lock()
+        self._seed_lock = threading.Lock()
+        self._pending: Optional[Dict[str, int]] = None
+        self._seeded_at = 0.0
+        self.ready = False
+
+    def seed(self) -> None:
+        with self._lock:
+            self._pending = {}
+        try:
+            with Session(get_engine()) as db:
+                rows = db.exec(select(User.username, User.total_xp)).all()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        xp = {username: total_xp or 0 for username, total_xp in rows}
+        order = sorted((-value, username) for username, value in xp.items())
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._xp, self._order = xp, order
+            for username, total_xp in pending.items():
+                self._set(username, total_xp)
+            self._seeded_at = time.monotonic()
+            self.ready = True
+
+    def ensure_fresh(self) -> bool:
+        """
+        Start a background seed when there is no snapshot or it is older than
+        the TTL. Never waits for it; returns `ready`.
+        """
+        if self.ready and time.monotonic() - self._seeded_at < self.ttl_seconds:
+            return True
+        if self._seed_lock.acquire(blocking=False):
+            threading.Thread(target=self._seed_in_background, name="xp-ranking-seed", daemon=True).start()
+        return self.ready
+
+    def _seed_in_background(self) -> None:
+        try:
+            self.seed()
+        except Exception:
+            logger.exception("Seeding the XP ranking failed.")
+        finally:
+            self._seed_lock.release()
+
+    def set(self, username: str, total_xp: int) -> None:
+        """Record a user's new XP total (also used for newly registered users)."""
+        total_xp = total_xp or 0
+        with self._lock:
+            if self._pending is not None:
+                self._pending[username] = total_xp
+            self._set(username, total_xp)
+
+    def _set(self, username: str, total_xp: int) -> None:
+        # Caller holds self._lock.
+        previous = self._xp.get(username)
+        if previous == total_xp:
+            return
+        if previous is not None:
+            del self._order[bisect.bisect_left(self._order, (-previous, username))]
+        self._xp[username] = total_xp
+        bisect.insort(self._order, (-total_xp, username))
+
+    def _rank_of(self, total_xp: int) -> int:
+        # Competition ranking: users tied on XP share a rank.
+        return bisect.bisect_left(self._order, (-total_xp, "")) + 1
+
+    def top(self, limit: int) -> List[Tuple[int, str, int]]:
+        """`(rank, username, total_xp)` for the first `limit` users."""
+        with self._lock:
+            return [(self._rank_of(-neg), username, -neg) for neg, username in self._order[:limit]]
+
+    def rank(self, username: str) -> Optional[Tuple[int, int]]:
+        """`(rank, total_xp)` for one user, or None if unknown."""
+        with self._lock:
+            total_xp = self._xp.get(username)
+            if total_xp is None:
+                return None
+            return self._rank_of(total_xp), total_xp
+
+    def __len__(self) -> int:
+        return len(self._xp)
+
+
+xp_ranking = XPRanking()
@@ -0,0 +1,117 @@
+"""
+Minimal in-process ASGI driver used by the benchmarks.
+
+Talks to the FastAPI app directly through its ASGI callable (no sockets, no
+threads per connection), so hundreds of concurrent clients fit in one event loop.
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Run the app's startup/shutdown around a block."""
+    async with app.router.lifespan_context(app):
+        yield
+
+
+async def request(
+    app,
+    method: str,
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+    body: Any = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Tuple[int, Any]:
+    """Issue one HTTP request; returns `(status, decoded JSON or raw bytes)`."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    raw_headers = [(b"content-type", b"application/json")] if body is not None else []
+    for key, value in (headers or {}).items():
+        raw_headers.append((key.lower().encode(), value.encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(params or {}).encode(),
+        "headers": raw_headers,
+        "client": ("bench", 0),
+        "server": ("bench", 80),
+    }
+    sent = False
+    status = 0
+    chunks = []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    data = b"".join(chunks)
+    try:
+        return status, json.loads(data) if data else None
+    except ValueError:
+        return status, data
+
+
+class WebSocketClient:
+    """One in-process WebSocket connection."""
+
+    def __init__(self, app, path: str, params: Optional[Dict[str, Any]] = None):
+        self._app = app
+        self._scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": urlencode(params or {}).encode(),
+            "headers": [],
+            "client": ("bench", 0),
+            "server": ("bench", 80),
+            "subprotocols": [],
+        }
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._app(self._scope, self._to_app.get, self._from_app.put))
+        await self._to_app.put({"type": "websocket.connect"})
+        message = await self._from_app.get()
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"WebSocket rejected: {message}")
+        return self
+
+    async def __aexit__(self, *exc):
+        if not self.closed:
+            await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        await self._task
+
+    async def send_json(self, data: Any) -> None:
+        await self._to_app.put({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def receive_json(self) -> Optional[Any]:
+        """Next JSON message, or None once the server closed the socket."""
+        message = await self._from_app.get()
+        if message["type"] == "websocket.close":
+            self.closed = True
+            return None
+        return json.loads(message.get("text") or message["bytes"])
@@ -0,0 +1,101 @@
+"""
+Multithreaded stress test for boss battle state.
+
+Many threads hammer `submit_answer` for a pool of users at once, so every
+answer races against duplicates for the same user, the same way Starlette's
+threadpool runs the sync endpoints. Afterwards the invariants are checked:
+
+- every accepted answer advanced exactly one question,
+- every battle was finalized exactly once (one `BossBattle` row),
+- score + lives lost == questions answered, and XP == 20 * score.
+
+    python -m bench.boss_stress --users 200 --threads 32
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from random import randint
+
+
+def main(users: int, threads: int, duplicates: int) -> int:
+    from fastapi import HTTPException
+    from sqlmodel import Session, select
+
+    from app.database import engine, init_db
+    from app.models import BossBattle, User
+    from app.question_bank import load_question_bank
+    from app.routers import bossbattle
+
+    init_db()
+    load_question_bank()
+    names = [f"stress_{i}" for i in range(users)]
+    with Session(engine) as db:
+        db.add_all(User(username=name) for name in names)
+        db.commit()
+    for name in names:
+        bossbattle.start_boss_battle(bossbattle.StartRequest(user=name, total_questions=5))
+
+    accepted = Counter()
+    outcomes = Counter()
+
+    def answer(name):
+        try:
+            result = bossbattle.submit_answer(bossbattle.AnswerRequest(user=name, choice_idx=randint(0, 3)))
+        except HTTPException as exc:
+            outcomes[f"http_{exc.status_code}"] += 1
+            return
+        if "message" in result:
+            outcomes["already_closed"] += 1
+            return
+        accepted[name] += 1
+        outcomes[result.get("status", "answered")] += 1
+
+    # Each user gets `duplicates` concurrent submissions per question.
+    jobs = [name for _ in range(5 * duplicates) for name in names]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(answer, jobs))
+    elapsed = time.perf_counter() - started
+
+    with Session(engine) as db:
+        rows = db.exec(select(BossBattle).where(BossBattle.user.in_(names))).all()
+        battles = Counter(b.user for b in rows)
+        records = {b.user: b for b in rows}
+        xp = {u.username: u.total_xp for u in db.exec(select(User).where(User.username.in_(names)))}
+
+    failures = []
+    for name in names:
+        record = records.get(name)
+        if battles[name] != 1:
+            failures.append(f"{name}: finalized {battles[name]} times")
+            continue
+        lives_lost = accepted[name] - record.score
+        if lives_lost > 3 or record.score + lives_lost != accepted[name]:
+            failures.append(f"{name}: {accepted[name]} answers but score={record.score}")
+        if xp[name] != record.score * 20:
+            failures.append(f"{name}: xp={xp[name]} for score={record.score}")
+
+    print(f"submissions: {len(jobs)} in {elapsed:.2f}s ({len(jobs) / elapsed:.0f}/s)")
+    print(f"accepted answers: {sum(accepted.values())} ({sum(accepted.values()) / elapsed:.0f}/s)")
+    print(f"outcomes: {dict(outcomes)}")
+    if failures:
+        print(f"{len(failures)} invariant violations, e.g.:")
+        for line in failures[:10]:
+            print("  " + line)
+        return 1
+    print("all invariants hold")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--duplicates", type=int, default=3, help="concurrent submissions per question")
+    args = parser.parse_args()
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    raise SystemExit(main(args.users, args.threads, args.duplicates))
@@ -0,0 +1,53 @@
+"""
+Bulk user import benchmark.
+
+Times `import_users` on N synthetic rows (10% of them duplicates of existing
+users) against registering a sample one by one through `register_user`.
+
+    python -m bench.bulk_users --rows 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def main(rows: int, sample: int) -> None:
+    from fastapi import HTTPException
+
+    from app.database import init_db
+    from app.routers.users import register_user
+    from app.schemas import UserCreate
+    from app.user_import import import_users
+
+    init_db()
+    existing = rows // 10
+    import_users({"username": f"student{i:07d}"} for i in range(existing))
+
+    payload = [{"username": f"student{i:07d}", "email": f"s{i}@school.example"} for i in range(rows)]
+    started = time.perf_counter()
+    result = import_users(payload)
+    bulk = time.perf_counter() - started
+    print(f"bulk import: {rows} rows in {bulk:.2f}s ({rows / bulk:,.0f} rows/s) -> {result}")
+
+    started = time.perf_counter()
+    for i in range(sample):
+        try:
+            register_user(UserCreate(username=f"single{i:07d}"))
+        except HTTPException:
+            pass
+    single = time.perf_counter() - started
+    print(
+        f"register_user: {sample} rows in {single:.2f}s ({sample / single:,.0f} rows/s), "
+        f"~{single / sample * rows:.0f}s extrapolated to {rows} rows"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--sample", type=int, default=1000, help="rows to register one at a time")
+    args = parser.parse_args()
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    main(args.rows, args.sample)
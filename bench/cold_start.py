@@ -0,0 +1,82 @@
+"""
+Cold-start benchmark for the serverless entry point.
+
+Each run is a fresh interpreter that imports `api.index` and runs the app's
+startup (lifespan), as a new Vercel instance does before its first request.
+Three cases against the same database:
+
+- first boot: empty database, tables created and stamped with the schema version
+- warm schema: version matches, `create_all` and migrations are skipped
+- SCHEMA_SYNC=always: the old behaviour, schema checked on every start
+
+Exits non-zero when the warm-schema median exceeds `--budget-ms`, so CI can
+use it as a startup time budget:
+
+    python -m bench.cold_start --runs 5 --budget-ms 2500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import api.index
+from app.main import app
+imported = time.perf_counter()
+
+async def boot():
+    async with app.router.lifespan_context(app):
+        pass
+
+asyncio.run(boot())
+print(json.dumps({"import": imported - started, "startup": time.perf_counter() - imported}))
+"""
+
+
+def probe(env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def report(label: str, samples: list) -> tuple:
+    imports = [s["import"] * 1000 for s in samples]
+    startups = [s["startup"] * 1000 for s in samples]
+    totals = [i + s for i, s in zip(imports, startups)]
+    print(
+        f"{label:<22} import {statistics.median(imports):7.1f} ms   startup {statistics.median(startups):7.1f} ms"
+        f"   total {statistics.median(totals):7.1f} ms (median of {len(samples)})"
+    )
+    return statistics.median(totals), statistics.median(startups)
+
+
+def main(runs: int, budget_ms: float) -> int:
+    base = {**os.environ, "LEADERBOARD_SNAPSHOT_SECONDS": "0", "PYTHONWARNINGS": "ignore"}
+    if "DATABASE_URL" not in base:
+        base["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/cold_start.db"
+    report("first boot", [probe(base)])
+    warm, warm_startup = report("warm schema", [probe(base) for _ in range(runs)])
+    _, always_startup = report("SCHEMA_SYNC=always", [probe({**base, "SCHEMA_SYNC": "always"}) for _ in range(runs)])
+    print(f"skipping the schema sync saved {always_startup - warm_startup:.1f} ms of startup")
+    if warm > budget_ms:
+        print(f"FAIL: warm-schema cold start {warm:.1f} ms exceeds the {budget_ms:.0f} ms budget")
+        return 1
+    print(f"OK: within the {budget_ms:.0f} ms budget")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=2500)
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.budget_ms))
@@ -0,0 +1,87 @@
+"""
+Pair-lookup benchmark on a large friendship graph.
+
+Builds a random graph (default 1M edges over 100k users) in canonical-pair
+form, then times the same pair lookups two ways:
+
+- canonical: one probe on the unique (user, friend_username) index
+- legacy: the old `(a, b) OR (b, a)` predicate
+
+    python -m bench.friend_pairs --edges 1000000 --users 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+
+def main(edges: int, users: int, lookups: int) -> None:
+    from sqlalchemy import insert, text
+    from sqlmodel import Session, select
+
+    from app.database import engine, init_db
+    from app.models import Friend
+    from app.routers.socialfeatures import canonical_pair
+
+    init_db()
+    names = [f"u{i:07d}" for i in range(users)]
+    pairs = set()
+    while len(pairs) < edges:
+        a, b = random.sample(names, 2)
+        pairs.add(canonical_pair(a, b))
+    pairs = list(pairs)
+
+    started = time.perf_counter()
+    with Session(engine) as db:
+        for i in range(0, len(pairs), 10_000):
+            rows = [
+                {"user": low, "friend_username": high, "requester": low, "status": "accepted"}
+                for low, high in pairs[i:i + 10_000]
+            ]
+            db.exec(insert(Friend), params=rows)
+        db.commit()
+    print(f"inserted {edges} edges in {time.perf_counter() - started:.1f}s")
+
+    # Half the probes hit an existing edge (in random direction), half miss.
+    probes = []
+    for low, high in random.sample(pairs, lookups // 2):
+        probes.append((low, high) if random.random() < 0.5 else (high, low))
+    probes += [tuple(random.sample(names, 2)) for _ in range(lookups - len(probes))]
+
+    def canonical(db, a, b):
+        low, high = canonical_pair(a, b)
+        return db.exec(select(Friend.id).where(Friend.user == low, Friend.friend_username == high)).first()
+
+    def legacy(db, a, b):
+        return db.exec(select(Friend.id).where(
+            ((Friend.user == a) & (Friend.friend_username == b))
+            | ((Friend.user == b) & (Friend.friend_username == a))
+        )).first()
+
+    with Session(engine) as db:
+        for label, lookup in (("canonical", canonical), ("legacy OR", legacy)):
+            started = time.perf_counter()
+            hits = sum(1 for a, b in probes if lookup(db, a, b) is not None)
+            elapsed = time.perf_counter() - started
+            print(f"{label:>10}: {lookups} lookups, {hits} hits, {elapsed / lookups * 1e6:.1f} us/lookup")
+
+        if engine.dialect.name == "sqlite":
+            a, b = probes[0]
+            low, high = canonical_pair(a, b)
+            plan = db.connection().execute(
+                text('EXPLAIN QUERY PLAN SELECT id FROM friend WHERE "user" = :a AND friend_username = :b'),
+                {"a": low, "b": high},
+            ).all()
+            print("canonical plan:", "; ".join(row[-1] for row in plan))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--edges", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    main(args.edges, args.users, args.lookups)
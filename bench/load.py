@@ -0,0 +1,244 @@
+"""
+Scenario-based load runner.
+
+Drives the app in-process (see bench/asgi.py) with `--concurrency` clients,
+each picking weighted requests from a scenario against users sampled from
+the database (seed it first with `python -m bench.seed`). Reports count,
+errors, p50/p95/p99 latency and throughput per endpoint, and writes them as
+JSON so runs can be compared:
+
+    python -m bench.load --scenario read --duration 30 --output before.json
+    python -m bench.load --scenario read --duration 30 --compare before.json
+
+Scenarios: read (dashboard-heavy), mixed (read + 15% writes), write.
+Only 5xx responses and exceptions count as errors; 4xx responses (e.g. a
+user without progress yet) are reported separately.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# (weight, method, endpoint label, build(rng, user, users) -> (path, params, body))
+Step = Tuple[float, str, str, Callable]
+
+READS: List[Step] = [
+    (20, "GET", "/home/dashboard", lambda rng, u, users: ("/home/dashboard", {"user": u}, None)),
+    (10, "GET", "/users/{username}", lambda rng, u, users: (f"/users/{u}", None, None)),
+    (10, "GET", "/progress/stats", lambda rng, u, users: ("/progress/stats", {"user": u}, None)),
+    (5, "GET", "/progress/", lambda rng, u, users: ("/progress/", {"user": u}, None)),
+    (10, "GET", "/quests/level/{username}", lambda rng, u, users: (f"/quests/level/{u}", None, None)),
+    (10, "GET", "/social/leaderboard/friends", lambda rng, u, users: ("/social/leaderboard/friends", {"user": u}, None)),
+    (5, "GET", "/social/leaderboard/rank/{username}", lambda rng, u, users: (f"/social/leaderboard/rank/{u}", None, None)),
+    (5, "GET", "/social/leaderboard", lambda rng, u, users: ("/social/leaderboard", {"period": "live"}, None)),
+    (5, "GET", "/social/feed", lambda rng, u, users: ("/social/feed", {"user": u}, None)),
+    (5, "GET", "/social/friends/list", lambda rng, u, users: ("/social/friends/list", {"user": u}, None)),
+    (5, "GET", "/boss/leaderboard", lambda rng, u, users: ("/boss/leaderboard", None, None)),
+    (5, "GET", "/cosmetics/badges", lambda rng, u, users: ("/cosmetics/badges", None, None)),
+    (5, "GET", "/sync", lambda rng, u, users: ("/sync", {"user": u}, None)),
+]
+
+WRITES: List[Step] = [
+    (10, "POST", "/progress/", lambda rng, u, users: ("/progress/", None, {
+        "user": u, "date": datetime.utcnow().isoformat(), "duration_minutes": rng.choice((25, 50, 75)),
+    })),
+    (3, "POST", "/text-ai/", lambda rng, u, users: ("/text-ai/", None, {
+        "user": u, "date": datetime.utcnow().isoformat(), "reflection_text": "Focused session, good progress.",
+    })),
+    (2, "POST", "/social/friends/add", lambda rng, u, users: ("/social/friends/add", None, {
+        "user": u, "friend_username": rng.choice(users), "status": "pending",
+    })),
+]
+
+
+def _scale(steps: List[Step], total: int) -> List[Step]:
+    weight = sum(step[0] for step in steps)
+    return [(step[0] * total / weight, *step[1:]) for step in steps]
+
+
+SCENARIOS: Dict[str, List[Step]] = {
+    "read": READS,
+    "mixed": _scale(READS, 85) + _scale(WRITES, 15),
+    "write": WRITES,
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int, client_errors: int) -> Dict[str, Any]:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "client_errors": client_errors,
+        "throughput_rps": round(len(values) / elapsed, 1),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def _sample_users(count: int) -> List[str]:
+    from sqlalchemy import func
+    from sqlmodel import Session, select
+
+    from app.database import engine
+    from app.models import User
+
+    with Session(engine) as db:
+        return list(db.exec(select(User.username).order_by(func.random()).limit(count)).all())
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(scenario: str, concurrency: int, duration: float, requests: Optional[int],
+              warmup: int, user_sample: int, seed: int) -> Dict[str, Any]:
+    from app.database import engine
+    from app.main import app
+    from bench.asgi import lifespan, request
+
+    steps = SCENARIOS[scenario]
+    weights = [step[0] for step in steps]
+    results: Dict[str, Dict[str, Any]] = {
+        f"{method} {label}": {"latencies": [], "errors": 0, "client_errors": 0} for _, method, label, _ in steps
+    }
+    issued = 0
+
+    async with lifespan(app):
+        users = await asyncio.to_thread(_sample_users, user_sample)
+        if not users:
+            raise SystemExit("No users in the database; run `python -m bench.seed` first.")
+
+        async def one(rng: random.Random, record: bool) -> None:
+            _, method, label, build = rng.choices(steps, weights)[0]
+            path, params, body = build(rng, rng.choice(users), users)
+            started = time.perf_counter()
+            try:
+                status, _ = await request(app, method, path, params=params, body=body)
+            except Exception:
+                status = 599
+            elapsed = time.perf_counter() - started
+            if record:
+                entry = results[f"{method} {label}"]
+                entry["latencies"].append(elapsed)
+                if status >= 500:
+                    entry["errors"] += 1
+                elif status >= 400:
+                    entry["client_errors"] += 1
+
+        warm_rng = random.Random(seed - 1)
+        for _ in range(warmup):
+            await one(warm_rng, record=False)
+
+        deadline = time.perf_counter() + duration
+
+        def more() -> bool:
+            if requests is None:
+                return time.perf_counter() < deadline
+            return issued < requests
+
+        async def client(n: int) -> None:
+            nonlocal issued
+            rng = random.Random(seed + n)
+            while more():
+                issued += 1
+                await one(rng, record=True)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [lat for entry in results.values() for lat in entry["latencies"]]
+    return {
+        "meta": {
+            "scenario": scenario,
+            "concurrency": concurrency,
+            "elapsed_seconds": round(elapsed, 3),
+            "seed": seed,
+            "users_sampled": len(users),
+            "database": engine.dialect.name,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        "total": summarize(
+            all_latencies, elapsed,
+            sum(e["errors"] for e in results.values()), sum(e["client_errors"] for e in results.values()),
+        ),
+        "endpoints": {
+            name: summarize(entry["latencies"], elapsed, entry["errors"], entry["client_errors"])
+            for name, entry in sorted(results.items()) if entry["latencies"]
+        },
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    meta = report["meta"]
+    print(f"scenario={meta['scenario']} concurrency={meta['concurrency']} "
+          f"elapsed={meta['elapsed_seconds']}s db={meta['database']} commit={meta['commit']}")
+    header = f"{'endpoint':<42} {'count':>7} {'err':>5} {'4xx':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    if baseline:
+        header += f" {'Δp95':>8} {'Δrps':>8}"
+    print(header)
+    rows = [*report["endpoints"].items(), ("TOTAL", report["total"])]
+    for name, s in rows:
+        line = (f"{name:<42} {s['count']:>7} {s['errors']:>5} {s['client_errors']:>5} {s['throughput_rps']:>8} "
+                f"{s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8}")
+        if baseline:
+            before = baseline["total"] if name == "TOTAL" else baseline["endpoints"].get(name)
+            if before and before["p95_ms"] and before["throughput_rps"]:
+                line += (f" {(s['p95_ms'] / before['p95_ms'] - 1) * 100:>+7.1f}%"
+                         f" {(s['throughput_rps'] / before['throughput_rps'] - 1) * 100:>+7.1f}%")
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="read")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, default=None, help="stop after this many requests")
+    parser.add_argument("--warmup", type=int, default=200, help="unrecorded requests before measuring")
+    parser.add_argument("--user-sample", type=int, default=1000, help="users to draw requests for")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here (default: bench/results/<scenario>-<time>.json)")
+    parser.add_argument("--compare", help="earlier JSON report to diff p95 and throughput against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(
+        args.scenario, args.concurrency, args.duration, args.requests, args.warmup, args.user_sample, args.seed,
+    ))
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+    print_report(report, baseline)
+
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", f"{args.scenario}-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"report written to {output}")
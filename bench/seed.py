@@ -0,0 +1,237 @@
+"""
+Synthetic dataset generator.
+
+Fills the configured database (`studyquest.db`, or `DATABASE_URL`) with
+users, study sessions, friendships, quests, badges, reflections and boss
+battles using chunked executemany inserts. Activity is skewed towards a
+minority of heavy users, the way real traffic is. The same `--seed` always
+produces the same rows.
+
+Every user gets one "opening" XP ledger entry equal to the XP earned by
+their generated rows, and `User.total_xp` is set to the ledger sum, so
+`python -m app.xp reconcile` finds nothing to repair.
+
+    python -m bench.seed --users 100000 --progress 10000000
+    DATABASE_URL=postgresql://... python -m bench.seed --users 10000 --progress 500000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+
+CHUNK_SIZE = 10_000
+DIFFICULTY_XP = {"Easy": 20, "Medium": 50, "Hard": 100}
+BOSS_DIFFICULTIES = ("easy", "medium", "hard")
+REFLECTIONS = (
+    "Focused session on calculus, feeling productive.",
+    "Struggled with organic chemistry mechanisms today.",
+    "Reviewed history notes, good progress on the essay outline.",
+    "Tired but finished the physics problem set.",
+)
+
+
+class Generator:
+    def __init__(self, users: int, days: int, seed: int, prefix: str):
+        self.users = users
+        self.days = days
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.now = datetime.utcnow()
+        self.xp = [0] * users
+
+    def username(self, index: int) -> str:
+        return f"{self.prefix}{index:07d}"
+
+    def active_user(self) -> int:
+        """Index of a user, skewed so low indexes are far more active."""
+        return int(self.users * self.rng.random() ** 2)
+
+    def moment(self) -> datetime:
+        return self.now - timedelta(seconds=self.rng.random() * self.days * 86400)
+
+    def user_rows(self) -> Iterator[Dict]:
+        for i in range(self.users):
+            joined = self.moment()
+            yield {
+                "username": self.username(i),
+                "email": f"{self.username(i)}@school.example",
+                "join_date": joined,
+                "total_xp": 0,
+                "updated_at": joined,
+            }
+
+    def progress_rows(self, count: int) -> Iterator[Dict]:
+        for _ in range(count):
+            i = self.active_user()
+            minutes = self.rng.choice((25, 25, 50, 50, 75, 100, 120))
+            xp = (minutes // 25) * 10
+            self.xp[i] += xp
+            at = self.moment()
+            yield {
+                "user": self.username(i),
+                "date": at,
+                "duration_minutes": minutes,
+                "xp_gained": xp,
+                "reflection": None,
+                "updated_at": at,
+            }
+
+    def friend_rows(self, count: int) -> Iterator[Dict]:
+        count = min(count, self.users * (self.users - 1) // 2)
+        pairs = set()
+        while len(pairs) < count:
+            a, b = self.active_user(), self.rng.randrange(self.users)
+            if a != b:
+                pairs.add((min(a, b), max(a, b)))
+        for low, high in sorted(pairs):
+            at = self.moment()
+            yield {
+                "user": self.username(low),
+                "friend_username": self.username(high),
+                "requester": self.username(self.rng.choice((low, high))),
+                "since": at,
+                "status": "accepted" if self.rng.random() < 0.9 else "pending",
+                "updated_at": at,
+            }
+
+    def quest_rows(self, count: int) -> Iterator[Dict]:
+        for n in range(count):
+            i = self.active_user()
+            difficulty = self.rng.choice(tuple(DIFFICULTY_XP))
+            completed = self.rng.random() < 0.6
+            if completed:
+                self.xp[i] += DIFFICULTY_XP[difficulty]
+            yield {
+                "name": f"Quest {n}",
+                "description": f"{difficulty} study quest",
+                "difficulty": difficulty,
+                "xp_reward": DIFFICULTY_XP[difficulty],
+                "completed": completed,
+                "assigned_to": self.username(i),
+                "updated_at": self.moment(),
+            }
+
+    def badge_rows(self, count: int) -> Iterator[Dict]:
+        for n in range(count):
+            yield {
+                "name": f"Badge {n}",
+                "description": f"Reach {n * 250} XP",
+                "xp_required": n * 250,
+                "icon_url": None,
+                "updated_at": self.now,
+            }
+
+    def reflection_rows(self, count: int) -> Iterator[Dict]:
+        for _ in range(count):
+            i = self.active_user()
+            text = self.rng.choice(REFLECTIONS)
+            self.xp[i] += 10
+            at = self.moment()
+            yield {
+                "user": self.username(i),
+                "date": at,
+                "reflection_text": text,
+                "ai_feedback": "Keep reflecting — awareness is the key to consistent improvement.",
+                "summary": text,
+                "xp_reward": 10,
+                "updated_at": at,
+            }
+
+    def boss_rows(self, count: int) -> Iterator[Dict]:
+        for _ in range(count):
+            i = self.active_user()
+            score = self.rng.randint(0, 5)
+            self.xp[i] += score * 10
+            yield {
+                "user": self.username(i),
+                "date": self.moment(),
+                "score": score,
+                "total_questions": 5,
+                "xp_reward": score * 10,
+                "difficulty": self.rng.choice(BOSS_DIFFICULTIES),
+                "completed": True,
+            }
+
+    def ledger_rows(self) -> Iterator[Dict]:
+        for i, xp in enumerate(self.xp):
+            if xp:
+                yield {"user": self.username(i), "amount": xp, "source": "opening", "ref_id": None, "created_at": self.now}
+
+
+def _insert(engine, table, rows: Iterator[Dict], chunk_size: int) -> int:
+    from sqlalchemy import insert
+
+    statement = insert(table)
+    written = 0
+    chunk: List[Dict] = []
+    with engine.begin() as conn:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                conn.execute(statement, chunk)
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            conn.execute(statement, chunk)
+            written += len(chunk)
+    return written
+
+
+def main(args) -> None:
+    from sqlalchemy import func, select, update
+
+    from app.database import engine, init_db
+    from app.models import BossBattle, Badge, Friend, Progress, Quest, TextAIReflection, User, XPLedger
+
+    init_db()
+    user_table = User.__table__
+    with engine.connect() as conn:
+        if conn.execute(select(user_table.c.id).where(user_table.c.username.like(f"{args.prefix}%")).limit(1)).first():
+            raise SystemExit(f"Users named '{args.prefix}*' already exist; use another --prefix or an empty database.")
+
+    gen = Generator(args.users, args.days, args.seed, args.prefix)
+    steps: List[tuple] = [
+        ("users", User, gen.user_rows),
+        ("progress", Progress, lambda: gen.progress_rows(args.progress)),
+        ("friendships", Friend, lambda: gen.friend_rows(args.friendships)),
+        ("quests", Quest, lambda: gen.quest_rows(args.quests)),
+        ("badges", Badge, lambda: gen.badge_rows(args.badges)),
+        ("reflections", TextAIReflection, lambda: gen.reflection_rows(args.reflections)),
+        ("boss battles", BossBattle, lambda: gen.boss_rows(args.boss_battles)),
+        ("xp ledger", XPLedger, gen.ledger_rows),
+    ]
+    total_started = time.perf_counter()
+    for label, model, rows in steps:
+        started = time.perf_counter()
+        written = _insert(engine, model.__table__, rows(), args.chunk_size)
+        elapsed = time.perf_counter() - started
+        print(f"{label:>13}: {written:>11,} rows in {elapsed:7.1f}s ({written / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    ledger = XPLedger.__table__
+    with engine.begin() as conn:
+        conn.execute(
+            update(user_table)
+            .where(user_table.c.username.like(f"{args.prefix}%"))
+            .values(total_xp=func.coalesce(
+                select(func.sum(ledger.c.amount)).where(ledger.c.user == user_table.c.username).scalar_subquery(), 0
+            ))
+        )
+    print(f"done in {time.perf_counter() - total_started:.1f}s ({engine.url.render_as_string(hide_password=True)})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--progress", type=int, default=200_000, help="study sessions")
+    parser.add_argument("--friendships", type=int, default=50_000, help="friend pairs")
+    parser.add_argument("--quests", type=int, default=20_000)
+    parser.add_argument("--badges", type=int, default=50)
+    parser.add_argument("--reflections", type=int, default=20_000)
+    parser.add_argument("--boss-battles", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=90, help="spread activity over the last N days")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default="student", help="username prefix")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    main(parser.parse_args())
@@ -0,0 +1,80 @@
+"""
+Drive many concurrent boss battles over `/boss/ws` against the in-process app.
+
+    python -m bench.ws_battles --battles 300
+
+Uses a throwaway SQLite file unless DATABASE_URL is already set.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def _battle(app, user, think_seconds, latencies, outcomes):
+    from bench.asgi import WebSocketClient
+
+    async with WebSocketClient(app, "/boss/ws", {"user": user, "total_questions": 5}) as ws:
+        message = await ws.receive_json()
+        if message["type"] != "started":
+            outcomes[f"error:{message.get('status')}"] += 1
+            return
+        while True:
+            await asyncio.sleep(random.uniform(0, think_seconds))
+            sent_at = time.perf_counter()
+            await ws.send_json({"choice_idx": random.randint(0, 3)})
+            message = await ws.receive_json()
+            while message and message["type"] == "tick":
+                message = await ws.receive_json()
+            latencies.append(time.perf_counter() - sent_at)
+            if message is None or message["type"] in ("ended", "error"):
+                outcomes[message.get("status", "error") if message else "closed"] += 1
+                return
+
+
+async def main(battles: int, think_seconds: float) -> None:
+    from app.main import app
+    from bench.asgi import lifespan, request
+
+    async with lifespan(app):
+        users = [f"ws_bench_{i}" for i in range(battles)]
+        for user in users:
+            await request(app, "POST", "/users/", body={"username": user})
+
+        latencies, outcomes = [], Counter()
+        started = time.perf_counter()
+        await asyncio.gather(*(_battle(app, u, think_seconds, latencies, outcomes) for u in users))
+        elapsed = time.perf_counter() - started
+
+    print(f"battles: {battles} in {elapsed:.2f}s ({battles / elapsed:.1f} battles/s)")
+    print(f"answers: {len(latencies)} ({len(latencies) / elapsed:.1f} answers/s)")
+    if latencies:
+        print(
+            "answer latency ms: "
+            f"p50={_percentile(latencies, 50) * 1000:.1f} "
+            f"p95={_percentile(latencies, 95) * 1000:.1f} "
+            f"p99={_percentile(latencies, 99) * 1000:.1f} "
+            f"mean={statistics.mean(latencies) * 1000:.1f}"
+        )
+    print(f"outcomes: {dict(outcomes)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--battles", type=int, default=200)
+    parser.add_argument("--think", type=float, default=0.05, help="max seconds between answers")
+    args = parser.parse_args()
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    asyncio.run(main(args.battles, args.think))
@@ -0,0 +1,116 @@
+"""
+One boss battle driven by two worker processes sharing a SQLite database
+through `DatabaseBattleStore` (BOSS_SESSION_STORE=database).
+
+Each worker is a separate interpreter reading one command per line on stdin
+and answering with one JSON line, so the test decides whose turn it is.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = """
+import json, sys
+from fastapi import HTTPException
+from sqlmodel import Session, select
+from app.database import get_engine, init_db
+from app.models import BossBattle, User
+from app.question_bank import load_question_bank, question_bank
+from app.battle_store import battle_store
+from app.routers import bossbattle
+
+init_db()
+load_question_bank()
+
+for line in sys.stdin:
+    command, user = line.split()
+    try:
+        if command == "register":
+            with Session(get_engine()) as db:
+                db.add(User(username=user))
+                db.commit()
+            result = {"ok": True}
+        elif command == "start":
+            result = bossbattle.start_boss_battle(bossbattle.StartRequest(user=user, total_questions=4))
+        elif command == "answer":
+            sess = battle_store.get(user)
+            correct = question_bank.get(sess.question_ids[sess.index])["answer_idx"] if sess else 0
+            result = bossbattle.submit_answer(bossbattle.AnswerRequest(user=user, choice_idx=correct))
+        elif command == "stale":
+            # Save a copy another worker has already moved past.
+            sess = battle_store.get(user)
+            sess.version -= 1
+            result = {"saved": battle_store.save(user, sess)}
+        elif command == "battles":
+            with Session(get_engine()) as db:
+                rows = db.exec(select(BossBattle).where(BossBattle.user == user)).all()
+            result = {"battles": [{"score": r.score, "xp_reward": r.xp_reward} for r in rows]}
+    except HTTPException as exc:
+        result = {"status": exc.status_code, "detail": exc.detail}
+    print(json.dumps(result, default=str), flush=True)
+"""
+
+
+class Worker:
+    def __init__(self, env):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-c", WORKER], cwd=ROOT, env=env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+
+    def send(self, command: str, user: str) -> dict:
+        self.proc.stdin.write(f"{command} {user}\n")
+        self.proc.stdin.flush()
+        return json.loads(self.proc.stdout.readline())
+
+    def close(self) -> None:
+        self.proc.stdin.close()
+        self.proc.wait(timeout=30)
+
+
+@pytest.fixture
+def workers(tmp_path):
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'battle.db'}",
+        "BOSS_SESSION_STORE": "database",
+        "SLOW_QUERY_MS": "0",
+        "PYTHONWARNINGS": "ignore",
+    }
+    first = Worker(env)
+    first.send("register", "alice")  # creates the schema before the second worker starts
+    second = Worker(env)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_workers_take_turns_answering_one_battle(workers):
+    first, second = workers
+
+    started = first.send("start", "alice")
+    assert started["current_question"]["total"] == 4
+    assert second.send("start", "alice")["status"] == 409
+
+    turns = [second, first, second]
+    for number, worker in enumerate(turns, start=2):
+        result = worker.send("answer", "alice")
+        assert result["correct"] is True
+        assert result["score"] == number - 1
+        assert result["next_question"]["number"] == number
+
+    assert second.send("stale", "alice") == {"saved": False}
+
+    ended = first.send("answer", "alice")
+    assert ended["status"] == "completed"
+    assert ended["score"] == 4
+    assert ended["xp_reward"] == 80
+
+    assert second.send("answer", "alice")["status"] == 404
+    assert second.send("battles", "alice") == {"battles": [{"score": 4, "xp_reward": 80}]}
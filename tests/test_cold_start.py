@@ -0,0 +1,25 @@
+"""
+Startup time budget for the serverless entry point: runs `bench.cold_start`
+(fresh interpreters importing `api.index` and running the lifespan) against a
+throwaway SQLite database and fails when the warm-schema median is over budget.
+"""
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = os.getenv("COLD_START_BUDGET_MS", "2500")
+
+
+def test_cold_start_within_budget(tmp_path):
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'cold_start.db'}",
+        "SCHEMA_SYNC": "auto",
+    }
+    result = subprocess.run(
+        [sys.executable, "-m", "bench.cold_start", "--runs", "3", "--budget-ms", BUDGET_MS],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr